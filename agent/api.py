@@ -4,13 +4,15 @@ FastAPI endpoints for the agentic RAG system.
 
 import os
 import asyncio
-import json
+import time
 import logging
 from contextlib import asynccontextmanager
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import uuid
 
+import orjson
+
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,6 +20,7 @@ from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 from dotenv import load_dotenv
 from prometheus_client import generate_latest
+from pydantic_ai.messages import PartStartEvent, PartDeltaEvent, TextPartDelta
 
 from .agent import rag_agent, AgentDependencies
 from .db_utils import (
@@ -74,6 +77,12 @@ APP_PORT = int(os.getenv("APP_PORT", 8000))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 ENABLE_METRICS = os.getenv("ENABLE_METRICS", "true").lower() == "true"
 METRICS_PORT = int(os.getenv("METRICS_PORT", 9090))
+# Seconds a healthy /health result is reused, so frequent monitoring probes don't hit
+# Postgres, Neo4j and Redis on every poll. Off by default (0): opt in where probes are frequent
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", 0))
+
+# (monotonic time of the check, result) of the last healthy /health check
+_health_cache: Optional[Tuple[float, HealthStatus]] = None
 
 # Configure logging
 logging.basicConfig(
@@ -93,22 +102,22 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up agentic RAG API...")
     
     try:
-        # Initialize database connections
-        await initialize_database()
-        logger.info("Database initialized")
-        
-        # Initialize graph database
-        await initialize_graph()
-        logger.info("Graph database initialized")
-        
-        # Initialize cache
-        await initialize_cache()
-        logger.info("Cache manager initialized")
+        # Initialize database, graph database and cache concurrently: they are independent,
+        # so startup waits for the slowest one instead of the sum of all three
+        await asyncio.gather(
+            initialize_database(),
+            initialize_graph(),
+            initialize_cache()
+        )
+        logger.info("Database, graph database and cache manager initialized")
         
-        # Test connections
-        db_ok = await test_connection()
-        graph_ok = await test_graph_connection()
-        cache_ok = (await cache_manager.health_check()).get("status") == "healthy"
+        # Test connections (independent backends, checked concurrently)
+        db_ok, graph_ok, cache_health = await asyncio.gather(
+            test_connection(),
+            test_graph_connection(),
+            cache_manager.health_check()
+        )
+        cache_ok = cache_health.get("status") == "healthy"
         
         if not db_ok:
             logger.error("Database connection failed")
@@ -133,13 +142,18 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down agentic RAG API...")
     
-    try:
-        await close_database()
-        await close_graph()
-        await close_cache()
-        logger.info("Connections closed")
-    except Exception as e:
+    # Close every backend even if one of them fails
+    results = await asyncio.gather(
+        close_database(),
+        close_graph(),
+        close_cache(),
+        return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    for e in errors:
         logger.error(f"Shutdown error: {e}")
+    if not errors:
+        logger.info("Connections closed")
 
 
 # Create FastAPI app
@@ -208,6 +222,26 @@ async def get_conversation_context(
     ]
 
 
+# Tool args and search results may hold numpy values and non-string keys; anything else falls back to str
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """
+    Encode a payload as a Server-Sent Events data frame.
+    
+    orjson serializes straight to UTF-8 bytes, so frames are neither
+    escaped to ASCII nor re-encoded by the response.
+    
+    Args:
+        payload: JSON-serializable event
+    
+    Returns:
+        Encoded frame
+    """
+    return b"data: " + orjson.dumps(payload, default=str, option=_ORJSON_OPTIONS) + b"\n\n"
+
+
 def extract_tool_calls(result) -> List[ToolCall]:
     """
     Extract tool calls from Pydantic AI result.
@@ -243,10 +277,9 @@ def extract_tool_calls(result) -> List[ToolCall]:
                                 if isinstance(part.args, str):
                                     # Args is a JSON string, parse it
                                     try:
-                                        import json
-                                        tool_args = json.loads(part.args)
+                                        tool_args = orjson.loads(part.args)
                                         logger.debug(f"Parsed args from JSON string: {tool_args}")
-                                    except json.JSONDecodeError as e:
+                                    except orjson.JSONDecodeError as e:
                                         logger.debug(f"Failed to parse args JSON: {e}")
                                         tool_args = {}
                                 elif isinstance(part.args, dict):
@@ -391,11 +424,19 @@ async def execute_agent(
 @app.get("/health", response_model=HealthStatus)
 async def health_check():
     """Health check endpoint."""
+    global _health_cache
+    
+    checked_at = time.monotonic()
+    if _health_cache is not None and checked_at - _health_cache[0] < HEALTH_CACHE_TTL:
+        return _health_cache[1]
+    
     try:
-        # Test database connections
-        db_status = await test_connection()
-        graph_status = await test_graph_connection()
-        cache_health = await cache_manager.health_check()
+        # Test database connections concurrently: the check takes as long as the slowest backend
+        db_status, graph_status, cache_health = await asyncio.gather(
+            test_connection(),
+            test_graph_connection(),
+            cache_manager.health_check()
+        )
         cache_status = cache_health.get("status") == "healthy"
         
         # Update connection metrics
@@ -409,7 +450,7 @@ async def health_check():
         else:
             status = "unhealthy"
         
-        return HealthStatus(
+        health = HealthStatus(
             status=status,
             database=db_status,
             graph_database=graph_status,
@@ -417,6 +458,10 @@ async def health_check():
             version="0.1.0",
             timestamp=datetime.now()
         )
+        # Degraded and unhealthy results are never reused: a recovery or a new failure
+        # must show up on the very next probe
+        _health_cache = (checked_at, health) if status == "healthy" else None
+        return health
         
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -449,8 +494,10 @@ async def get_metrics():
 async def database_status():
     """Get detailed database status and metrics."""
     try:
-        status = await get_database_status()
-        cache_health = await cache_manager.health_check()
+        status, cache_health = await asyncio.gather(
+            get_database_status(),
+            cache_manager.health_check()
+        )
         
         return {
             "database": status,
@@ -498,7 +545,7 @@ async def chat_stream(request: ChatRequest):
         async def generate_stream():
             """Generate streaming response using agent.iter() pattern."""
             try:
-                yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+                yield sse_event({'type': 'session', 'session_id': session_id})
                 
                 # Create dependencies
                 deps = AgentDependencies(
@@ -526,7 +573,8 @@ async def chat_stream(request: ChatRequest):
                     metadata={"user_id": request.user_id}
                 )
                 
-                full_response = ""
+                # Deltas are joined once at the end: repeated str += copies the whole response per token
+                response_parts: List[str] = []
                 
                 # Stream using agent.iter() pattern
                 async with rag_agent.iter(full_prompt, deps=deps) as run:
@@ -535,17 +583,15 @@ async def chat_stream(request: ChatRequest):
                             # Stream tokens from the model
                             async with node.stream(run.ctx) as request_stream:
                                 async for event in request_stream:
-                                    from pydantic_ai.messages import PartStartEvent, PartDeltaEvent, TextPartDelta
-                                    
                                     if isinstance(event, PartStartEvent) and event.part.part_kind == 'text':
                                         delta_content = event.part.content
-                                        yield f"data: {json.dumps({'type': 'text', 'content': delta_content})}\n\n"
-                                        full_response += delta_content
+                                        yield sse_event({'type': 'text', 'content': delta_content})
+                                        response_parts.append(delta_content)
                                         
                                     elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
                                         delta_content = event.delta.content_delta
-                                        yield f"data: {json.dumps({'type': 'text', 'content': delta_content})}\n\n"
-                                        full_response += delta_content
+                                        yield sse_event({'type': 'text', 'content': delta_content})
+                                        response_parts.append(delta_content)
                 
                 # Extract tools used from the final result
                 result = run.result
@@ -561,20 +607,20 @@ async def chat_stream(request: ChatRequest):
                         }
                         for tool in tools_used
                     ]
-                    yield f"data: {json.dumps({'type': 'tools', 'tools': tools_data})}\n\n"
+                    yield sse_event({'type': 'tools', 'tools': tools_data})
                 
                 # Save assistant response
                 await add_message(
                     session_id=session_id,
                     role="assistant",
-                    content=full_response,
+                    content="".join(response_parts),
                     metadata={
                         "streamed": True,
                         "tool_calls": len(tools_used)
                     }
                 )
                 
-                yield f"data: {json.dumps({'type': 'end'})}\n\n"
+                yield sse_event({'type': 'end'})
                 
             except Exception as e:
                 logger.error(f"Stream error: {e}")
@@ -582,7 +628,7 @@ async def chat_stream(request: ChatRequest):
                     "type": "error",
                     "content": f"Stream error: {str(e)}"
                 }
-                yield f"data: {json.dumps(error_chunk)}\n\n"
+                yield sse_event(error_chunk)
         
         return StreamingResponse(
             generate_stream(),
@@ -10,6 +10,7 @@ from typing import Any, Dict, List, Optional, Union
 from datetime import timedelta
 import logging
 
+import orjson
 import redis.asyncio as aioredis
 from redis.asyncio import Redis
 from dotenv import load_dotenv
@@ -18,6 +19,9 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Cached values may hold numpy embeddings and non-string keys (e.g. chunk indexes)
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
 
 class CacheManager:
     """Manages Redis caching for query results and embeddings."""
@@ -86,7 +90,7 @@ class CacheManager:
         
         try:
             ttl_seconds = int((ttl or self.default_ttl).total_seconds())
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
             
             await self.redis.setex(key, ttl_seconds, serialized_value)
             logger.debug(f"Cache set: {key} (TTL: {ttl_seconds}s)")
@@ -104,7 +108,7 @@ class CacheManager:
             value = await self.redis.get(key)
             if value:
                 logger.debug(f"Cache hit: {key}")
-                return json.loads(value)
+                return orjson.loads(value)
             else:
                 logger.debug(f"Cache miss: {key}")
                 return None
@@ -276,14 +280,14 @@ class CacheManager:
             return {"status": "disconnected", "error": "Not initialized"}
         
         try:
-            # Test basic operations
+            # Test basic operations, sent as one round trip (no MULTI/EXEC needed)
             test_key = "health_check_test"
-            await self.redis.set(test_key, "test", ex=5)
-            value = await self.redis.get(test_key)
-            await self.redis.delete(test_key)
-            
-            # Get Redis info
-            info = await self.redis.info()
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(test_key, "test", ex=5)
+            pipe.get(test_key)
+            pipe.delete(test_key)
+            pipe.info()
+            _, value, _, info = await pipe.execute()
             
             return {
                 "status": "healthy",
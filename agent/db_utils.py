@@ -3,7 +3,7 @@ Database utilities for PostgreSQL connection and operations, aligned with the mu
 """
 
 import os
-import json
+import struct
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone, timedelta
@@ -12,6 +12,8 @@ from uuid import UUID
 import logging
 
 import asyncpg
+import numpy as np
+import orjson
 from asyncpg.pool import Pool
 from dotenv import load_dotenv
 
@@ -20,6 +22,24 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Session and message metadata may carry numpy scores and non-string keys
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# pgvector binary wire format: int16 dimensions, int16 unused, float4[dimensions] (big-endian)
+_VECTOR_HEADER = struct.Struct('>HH')
+
+
+def _encode_vector(value) -> bytes:
+    """Encode a sequence of floats (list or ndarray) as a pgvector binary value."""
+    data = np.asarray(value, dtype='>f4')
+    return _VECTOR_HEADER.pack(data.shape[0], 0) + data.tobytes()
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    """Decode a pgvector binary value into a list of floats."""
+    dimensions, _ = _VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype='>f4', count=dimensions, offset=_VECTOR_HEADER.size).tolist()
+
 
 class DatabasePool:
     """Manages PostgreSQL connection pool with monitoring and optimization."""
@@ -41,19 +61,30 @@ class DatabasePool:
     async def initialize(self):
         if not self.pool:
             try:
-                # Optimized pool settings for production workload
+                # Optimized pool settings for production workload.
+                # Postgres throughput peaks at roughly 2-3 active connections per core; a larger
+                # pool only adds contention, so the size follows the CPU count (capped at 25).
+                # The floor keeps small containers able to serve the API next to ingestion.
+                cpu_count = os.cpu_count() or 4
+                max_size = max(10, min(25, 2 * cpu_count))
                 self.pool = await asyncpg.create_pool(
                     self.database_url,
-                    min_size=10,                          # Increased minimum connections
-                    max_size=50,                          # Increased maximum connections
-                    max_inactive_connection_lifetime=600, # 10 minutes (increased)
+                    min_size=min(cpu_count, max_size),    # One warm connection per core
+                    max_size=max_size,                    # Bounded: more connections than this slow the DB down
+                    max_inactive_connection_lifetime=300, # 5 minutes
                     max_queries=50000,                    # Queries per connection before recycling
+                    statement_cache_size=1024,            # Prepared statements kept per connection
                     command_timeout=30,                   # Reduced timeout for faster failure detection
+                    # Sent in the startup packet: no extra round trips, and they stay the
+                    # session defaults, so the RESET ALL run on pool release keeps them
                     server_settings={
                         'search_path': 'public',
-                        'application_name': 'agentic_rag_agent'
+                        'application_name': 'agentic_rag_agent',
+                        'timezone': 'UTC',
+                        'plan_cache_mode': 'force_generic_plan',  # Reuse plans of prepared statements
+                        'effective_cache_size': '256MB',          # Optimize for read-heavy workload
+                        'random_page_cost': '1.1'
                     },
-                    setup=self._setup_connection,          # Connection setup hook
                     init=self._init_connection             # Connection initialization
                 )
                 logger.info(f"Database connection pool initialized: {self.pool.get_size()} connections")
@@ -69,20 +100,23 @@ class DatabasePool:
             self.pool = None
             logger.info("Database connection pool closed")
     
-    async def _setup_connection(self, connection):
-        """Setup individual connection with optimizations."""
-        # Enable prepared statements for better performance
-        await connection.execute("SET plan_cache_mode = force_generic_plan")
-        # Optimize for read-heavy workload
-        await connection.execute("SET effective_cache_size = '256MB'")
-        await connection.execute("SET random_page_cost = 1.1")
-        logger.debug("Connection optimizations applied")
-    
     async def _init_connection(self, connection):
         """Initialize connection with custom settings."""
-        # Set connection-specific settings
-        await connection.execute("SET TIME ZONE 'UTC'")
-        await connection.execute("SET client_encoding = 'UTF8'")
+        # Send/receive pgvector values in binary instead of formatting and parsing text.
+        # Queries pass embeddings as arrays and rely on this codec, so it is required; the
+        # extension may live in any schema (e.g. 'extensions' on managed Postgres)
+        vector_schema = await connection.fetchval(
+            "SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace WHERE t.typname = 'vector' LIMIT 1"
+        )
+        if vector_schema is None:
+            raise RuntimeError("pgvector type 'vector' not found: install the vector extension")
+        await connection.set_type_codec(
+            'vector',
+            schema=vector_schema,
+            encoder=_encode_vector,
+            decoder=_decode_vector,
+            format='binary'
+        )
         logger.debug("Connection initialized")
     
     @asynccontextmanager
@@ -132,14 +166,14 @@ class DatabasePool:
         """Perform pool health check."""
         try:
             async with self.acquire() as conn:
-                # Test basic query
-                result = await conn.fetchval("SELECT 1")
-                # Test vector extension
-                await conn.fetchval("SELECT COUNT(*) FROM pg_extension WHERE extname = 'vector'")
+                # Basic query and vector extension check in one round trip
+                row = await conn.fetchrow(
+                    "SELECT 1 AS basic, EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'vector') AS vector_extension"
+                )
                 
                 return {
-                    "basic_query": result == 1,
-                    "vector_extension": True,
+                    "basic_query": row["basic"] == 1,
+                    "vector_extension": row["vector_extension"],
                     "response_time_ms": 0  # Will be updated by metrics
                 }
         except Exception as e:
@@ -164,6 +198,21 @@ async def close_database():
     await db_pool.close()
 
 
+@asynccontextmanager
+async def acquire_connection(conn: Optional[asyncpg.Connection] = None):
+    """
+    Yield the caller's connection if given, otherwise acquire one from the pool.
+    
+    Lets callers that already hold a connection share it across several
+    operations instead of checking out a new one for each.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        async with db_pool.acquire() as pooled_conn:
+            yield pooled_conn
+
+
 # Session Management Functions (using rag_engine_chatsession)
 async def create_session(
     tenant_id: UUID,
@@ -185,7 +234,7 @@ async def create_session(
             tenant_id,
             user_id,
             title,
-            json.dumps(metadata or {}),
+            orjson.dumps(metadata or {}, option=_ORJSON_OPTIONS).decode(),
             expires_at
         )
         return result["id"]
@@ -225,7 +274,7 @@ async def update_session(session_id: str, tenant_id: UUID, metadata: Dict[str, A
             """,
             session_id,
             tenant_id,
-            json.dumps(metadata)
+            orjson.dumps(metadata, option=_ORJSON_OPTIONS).decode()
         )
         return result.split()[-1] != "0"
 
@@ -252,7 +301,7 @@ async def add_message(
             session_id,
             role,
             content,
-            json.dumps(metadata or {})
+            orjson.dumps(metadata or {}, option=_ORJSON_OPTIONS).decode()
         )
         return result["id"]
 
@@ -325,11 +374,10 @@ async def vector_search(
     Perform vector similarity search using the match_chunks function.
     """
     async with db_pool.acquire() as conn:
-        embedding_str = '[' + ','.join(map(str, embedding)) + ']'
         results = await conn.fetch(
             "SELECT * FROM match_chunks($1, $2::vector, $3)",
             tenant_id,
-            embedding_str,
+            embedding,
             limit
         )
         return [dict(row) for row in results]
@@ -346,11 +394,10 @@ async def hybrid_search(
     Perform hybrid search using the hybrid_search function.
     """
     async with db_pool.acquire() as conn:
-        embedding_str = '[' + ','.join(map(str, embedding)) + ']'
         results = await conn.fetch(
             "SELECT * FROM hybrid_search($1, $2::vector, $3, $4, $5)",
             tenant_id,
-            embedding_str,
+            embedding,
             query_text,
             limit,
             text_weight
@@ -3,7 +3,6 @@ Graph utilities for Neo4j/Graphiti integration, with multi-tenancy support.
 """
 
 import os
-import json
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
@@ -11,6 +10,7 @@ from contextlib import asynccontextmanager
 import asyncio
 from uuid import UUID
 
+import orjson
 from graphiti_core import Graphiti
 from graphiti_core.utils.maintenance.graph_data_operations import clear_data
 from graphiti_core.llm_client.config import LLMConfig
@@ -23,6 +23,10 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Episode metadata may carry numpy values and non-string keys
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
 class GraphitiClient:
     """Manages Graphiti knowledge graph operations with multi-tenancy."""
     
@@ -79,7 +83,7 @@ class GraphitiClient:
             reference_time=timestamp or datetime.now(timezone.utc),
             body=content,
             tenant_id=str(tenant_id),
-            metadata=json.dumps(metadata or {})
+            metadata=orjson.dumps(metadata or {}, option=_ORJSON_OPTIONS).decode()
         )
         logger.info(f"Added episode {episode_id} for tenant {tenant_id} to knowledge graph")
 
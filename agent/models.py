@@ -210,6 +210,8 @@ class IngestionConfig(BaseModel):
     extract_entities: bool = True
     # New option for faster ingestion
     skip_graph_building: bool = Field(default=False, description="Skip knowledge graph building for faster ingestion")
+    use_embedding_cache: bool = Field(default=True, description="Reuse embeddings of identical chunk content across runs")
+    max_concurrent_documents: int = Field(default=4, ge=1, le=32, description="Documents ingested concurrently")
     
     @field_validator('chunk_overlap')
     @classmethod
@@ -231,7 +231,7 @@ def track_rag_query(query_type: str = "hybrid", tenant_id: str = "default"):
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             
             try:
@@ -242,7 +242,7 @@ def track_rag_query(query_type: str = "hybrid", tenant_id: str = "default"):
                 logger.error("RAG query failed", error=str(e), query_type=query_type)
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 rag_queries_total.labels(
                     query_type=query_type,
                     status=status,
@@ -263,7 +263,7 @@ def track_rag_query(query_type: str = "hybrid", tenant_id: str = "default"):
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             
             try:
@@ -274,7 +274,7 @@ def track_rag_query(query_type: str = "hybrid", tenant_id: str = "default"):
                 logger.error("RAG query failed", error=str(e), query_type=query_type)
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 rag_queries_total.labels(
                     query_type=query_type,
                     status=status,
@@ -294,7 +294,7 @@ def track_vector_search(tenant_id: str = "default"):
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             result_count = 0
             
@@ -307,7 +307,7 @@ def track_vector_search(tenant_id: str = "default"):
                 logger.error("Vector search failed", error=str(e))
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 vector_search_total.labels(status=status, tenant_id=tenant_id).inc()
                 vector_search_duration.labels(tenant_id=tenant_id).observe(duration)
                 if status == "success":
@@ -322,7 +322,7 @@ def track_graph_query(query_type: str = "cypher", tenant_id: str = "default"):
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             
             try:
@@ -333,7 +333,7 @@ def track_graph_query(query_type: str = "cypher", tenant_id: str = "default"):
                 logger.error("Graph query failed", error=str(e), query_type=query_type)
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 graph_queries_total.labels(
                     query_type=query_type,
                     status=status,
@@ -353,7 +353,7 @@ def track_llm_request(provider: str = "openai", model: str = "gpt-4o-mini", tena
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             
             try:
@@ -383,7 +383,7 @@ def track_llm_request(provider: str = "openai", model: str = "gpt-4o-mini", tena
                 logger.error("LLM request failed", error=str(e), provider=provider, model=model)
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 llm_requests_total.labels(
                     provider=provider,
                     model=model,
@@ -405,7 +405,7 @@ def track_db_operation(database_type: str, operation: str):
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             status = "success"
             
             try:
@@ -419,7 +419,7 @@ def track_db_operation(database_type: str, operation: str):
                            operation=operation)
                 raise
             finally:
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 db_queries_total.labels(
                     database_type=database_type,
                     operation=operation,
@@ -442,7 +442,7 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
     """Custom middleware for additional monitoring capabilities."""
     
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Log request start
         logger.info(
@@ -455,7 +455,7 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         
         # Calculate request duration
-        duration = time.time() - start_time
+        duration = time.perf_counter() - start_time
         
         # Log request completion
         logger.info(
@@ -3,6 +3,7 @@ Flexible provider configuration for LLM and embedding models.
 """
 
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.models.openai import OpenAIModel
@@ -31,10 +32,14 @@ def get_llm_model(model_choice: Optional[str] = None) -> OpenAIModel:
     return OpenAIModel(llm_choice, provider=provider)
 
 
+@lru_cache(maxsize=None)
 def get_embedding_client() -> openai.AsyncOpenAI:
     """
     Get embedding client configuration based on environment variables.
     
+    The client is created once per process and shared by every caller, so the
+    agent tools, chunker and embedder reuse one HTTP connection pool.
+    
     Returns:
         Configured OpenAI-compatible client for embeddings
     """
@@ -5,12 +5,12 @@ Command Line Interface for Agentic RAG with Knowledge Graph.
 This CLI connects to the API and demonstrates the agent's tool usage capabilities.
 """
 
-import json
 import asyncio
 import aiohttp
+import orjson
 import argparse
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import sys
 
@@ -36,6 +36,7 @@ class AgenticRAGCLI:
         self.base_url = base_url.rstrip('/')
         self.session_id = None
         self.user_id = "cli_user"
+        self.http_session: Optional[aiohttp.ClientSession] = None
         
     def print_banner(self):
         """Print welcome banner."""
@@ -70,20 +71,19 @@ class AgenticRAGCLI:
     async def check_health(self) -> bool:
         """Check API health."""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/health") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        status = data.get('status', 'unknown')
-                        if status == 'healthy':
-                            print(f"{Colors.GREEN}✓ API is healthy{Colors.END}")
-                            return True
-                        else:
-                            print(f"{Colors.YELLOW}⚠ API status: {status}{Colors.END}")
-                            return False
+            async with self.http_session.get(f"{self.base_url}/health") as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    status = data.get('status', 'unknown')
+                    if status == 'healthy':
+                        print(f"{Colors.GREEN}✓ API is healthy{Colors.END}")
+                        return True
                     else:
-                        print(f"{Colors.RED}✗ API health check failed (HTTP {response.status}){Colors.END}")
+                        print(f"{Colors.YELLOW}⚠ API status: {status}{Colors.END}")
                         return False
+                else:
+                    print(f"{Colors.RED}✗ API health check failed (HTTP {response.status}){Colors.END}")
+                    return False
         except Exception as e:
             print(f"{Colors.RED}✗ Failed to connect to API: {e}{Colors.END}")
             return False
@@ -127,67 +127,66 @@ class AgenticRAGCLI:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/stream",
-                    json=request_data,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
+            async with self.http_session.post(
+                f"{self.base_url}/chat/stream",
+                json=request_data,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                
+                if response.status != 200:
+                    error_text = await response.text()
+                    print(f"{Colors.RED}✗ API Error ({response.status}): {error_text}{Colors.END}")
+                    return
+                
+                print(f"\n{Colors.BOLD}🤖 Assistant:{Colors.END}")
+                
+                tools_used = []
+                
+                async for line in response.content:
+                    # Frames are parsed as raw bytes: the trailing newline is JSON whitespace
+                    if not line.startswith(b'data: '):
+                        continue
                     
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"{Colors.RED}✗ API Error ({response.status}): {error_text}{Colors.END}")
-                        return
+                    try:
+                        data = orjson.loads(line[6:])  # Remove 'data: ' prefix
+                    except orjson.JSONDecodeError:
+                        # Skip malformed JSON
+                        continue
                     
-                    print(f"\n{Colors.BOLD}🤖 Assistant:{Colors.END}")
+                    event_type = data.get('type')
                     
-                    tools_used = []
-                    full_response = ""
+                    if event_type == 'session':
+                        # Store session ID for future requests
+                        self.session_id = data.get('session_id')
                     
-                    async for line in response.content:
-                        line = line.decode('utf-8').strip()
-                        
-                        if line.startswith('data: '):
-                            try:
-                                data = json.loads(line[6:])  # Remove 'data: ' prefix
-                                
-                                if data.get('type') == 'session':
-                                    # Store session ID for future requests
-                                    self.session_id = data.get('session_id')
-                                
-                                elif data.get('type') == 'text':
-                                    # Stream text content
-                                    content = data.get('content', '')
-                                    print(content, end='', flush=True)
-                                    full_response += content
-                                
-                                elif data.get('type') == 'tools':
-                                    # Store tools used information
-                                    tools_used = data.get('tools', [])
-                                
-                                elif data.get('type') == 'end':
-                                    # End of stream
-                                    break
-                                
-                                elif data.get('type') == 'error':
-                                    # Handle errors
-                                    error_content = data.get('content', 'Unknown error')
-                                    print(f"\n{Colors.RED}Error: {error_content}{Colors.END}")
-                                    return
-                            
-                            except json.JSONDecodeError:
-                                # Skip malformed JSON
-                                continue
+                    elif event_type == 'text':
+                        # Stream text content
+                        content = data.get('content', '')
+                        print(content, end='', flush=True)
                     
-                    # Print newline after response
-                    print()
+                    elif event_type == 'tools':
+                        # Store tools used information
+                        tools_used = data.get('tools', [])
                     
-                    # Display tools used
-                    if tools_used:
-                        print(f"\n{self.format_tools_used(tools_used)}")
+                    elif event_type == 'end':
+                        # End of stream
+                        break
                     
-                    # Print separator
-                    print(f"{Colors.BLUE}{'─' * 60}{Colors.END}")
+                    elif event_type == 'error':
+                        # Handle errors
+                        error_content = data.get('content', 'Unknown error')
+                        print(f"\n{Colors.RED}Error: {error_content}{Colors.END}")
+                        return
+                
+                # Print newline after response
+                print()
+                
+                # Display tools used
+                if tools_used:
+                    print(f"\n{self.format_tools_used(tools_used)}")
+                
+                # Print separator
+                print(f"{Colors.BLUE}{'─' * 60}{Colors.END}")
         
         except aiohttp.ClientError as e:
             print(f"{Colors.RED}✗ Connection error: {e}{Colors.END}")
@@ -196,6 +195,12 @@ class AgenticRAGCLI:
     
     async def run(self):
         """Run the CLI main loop."""
+        # One HTTP session for the whole run: every request reuses its keep-alive connections
+        async with aiohttp.ClientSession() as self.http_session:
+            await self._chat_loop()
+    
+    async def _chat_loop(self):
+        """Check the API, then read and answer user input until exit."""
         self.print_banner()
         
         # Check API health
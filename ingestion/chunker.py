@@ -33,7 +33,7 @@ class ChunkingConfig:
     chunk_overlap: int = 200
     use_semantic_splitting: bool = True
 
-@dataclass
+@dataclass(slots=True)
 class DocumentChunk:
     """Represents a document chunk."""
     content: str
@@ -42,6 +42,7 @@ class DocumentChunk:
     end_char: int
     metadata: Dict[str, Any]
     token_count: Optional[int] = None
+    embedding: Optional[Any] = None  # float32 vector set by the embedder
 
 class SemanticChunker:
     """Semantic document chunker using LLM for intelligent splitting."""
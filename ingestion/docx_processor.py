@@ -13,11 +13,16 @@ from docx.shared import Inches
 from docx.document import Document as DocumentType
 from docx.text.paragraph import Paragraph
 from docx.table import Table
+from docx.oxml.ns import qn
 
 from .chunker import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+WORD_PATTERN = re.compile(r'\S+')
+
+W_TR, W_TC, W_P, W_T = qn('w:tr'), qn('w:tc'), qn('w:p'), qn('w:t')
+
 
 class DOCXProcessor:
     """Processor for DOCX medical documents."""
@@ -50,8 +55,9 @@ class DOCXProcessor:
             content = self._extract_content(doc)
             metadata = self._extract_metadata(doc, file_path)
             
-            # Count pages (approximate)
-            page_count = self._estimate_page_count(content)
+            # Count words once and derive pages (approximate) from it
+            word_count = self._count_words(content)
+            page_count = self._estimate_page_count(word_count)
             
             result = {
                 "title": title,
@@ -62,7 +68,7 @@ class DOCXProcessor:
                     "file_type": "docx",
                     "estimated_pages": page_count,
                     "character_count": len(content),
-                    "word_count": len(content.split())
+                    "word_count": word_count
                 }
             }
             
@@ -135,19 +141,19 @@ class DOCXProcessor:
     
     def _extract_table_content(self, table: Table) -> str:
         """Extract text from a table."""
-        table_text = []
-        
-        for row in table.rows:
-            row_text = []
-            for cell in row.cells:
-                cell_text = cell.text.strip()
-                if cell_text:
-                    row_text.append(cell_text)
-            
-            if row_text:
-                table_text.append(' | '.join(row_text))
-        
-        return '\n'.join(table_text)
+        # Walk the table XML directly: python-docx's row/cell objects are rebuilt on every access
+        rows = (
+            ' | '.join(filter(None, (self._cell_text(tc) for tc in tr.iterchildren(W_TC))))
+            for tr in table._tbl.iterchildren(W_TR)
+        )
+        return '\n'.join(filter(None, rows))
+    
+    def _cell_text(self, tc) -> str:
+        """Text of a table cell, one line per paragraph."""
+        return '\n'.join(
+            ''.join(t.text for t in p.iter(W_T) if t.text)
+            for p in tc.iterchildren(W_P)
+        ).strip()
     
     def _extract_metadata(self, doc: DocumentType, file_path: str) -> Dict[str, Any]:
         """Extract metadata from DOCX document."""
@@ -177,10 +183,13 @@ class DOCXProcessor:
         
         return metadata
     
-    def _estimate_page_count(self, content: str) -> int:
-        """Estimate page count based on content length."""
+    def _count_words(self, content: str) -> int:
+        """Count words without materializing a list of substrings."""
+        return sum(1 for _ in WORD_PATTERN.finditer(content))
+    
+    def _estimate_page_count(self, word_count: int) -> int:
+        """Estimate page count based on word count."""
         # Rough estimate: ~500 words per page for medical texts
-        word_count = len(content.split())
         estimated_pages = max(1, round(word_count / 500))
         return estimated_pages
     
@@ -229,6 +238,11 @@ def create_docx_processor() -> DOCXProcessor:
     return DOCXProcessor()
 
 
+def process_docx_file(file_path: str) -> Dict[str, Any]:
+    """Process a DOCX file; module-level so worker processes receive only the path."""
+    return DOCXProcessor().process_docx_file(file_path)
+
+
 # Example usage
 if __name__ == "__main__":
     processor = create_docx_processor()
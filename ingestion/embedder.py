@@ -4,11 +4,14 @@ Document embedding generation for vector search.
 
 import os
 import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import json
 
+import numpy as np
 from openai import RateLimitError, APIError
 from dotenv import load_dotenv
 
@@ -118,7 +121,7 @@ class EmbeddingGenerator:
     async def generate_embeddings_batch(
         self,
         texts: List[str]
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
         """
         Generate embeddings for a batch of texts.
         
@@ -126,7 +129,7 @@ class EmbeddingGenerator:
             texts: List of texts to embed
         
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), dimensions)
         """
         # Filter and truncate texts
         processed_texts = []
@@ -148,7 +151,7 @@ class EmbeddingGenerator:
                     input=processed_texts
                 )
                 
-                return [data.embedding for data in response.data]
+                return np.array([data.embedding for data in response.data], dtype=np.float32)
                 
             except RateLimitError as e:
                 if attempt == self.max_retries - 1:
@@ -174,7 +177,7 @@ class EmbeddingGenerator:
     async def _process_individually(
         self,
         texts: List[str]
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
         """
         Process texts individually as fallback.
         
@@ -182,26 +185,21 @@ class EmbeddingGenerator:
             texts: List of texts to embed
         
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), dimensions)
         """
-        embeddings = []
+        # Rows left untouched stay zero vectors (empty text or failure)
+        embeddings = np.zeros((len(texts), self.config["dimensions"]), dtype=np.float32)
         
-        for text in texts:
+        for i, text in enumerate(texts):
             try:
                 if not text or not text.strip():
-                    embeddings.append([0.0] * self.config["dimensions"])
                     continue
                 
-                embedding = await self.generate_embedding(text)
-                embeddings.append(embedding)
-                
-                # Small delay to avoid overwhelming the API
-                await asyncio.sleep(0.1)
+                # Rate limits are handled by generate_embedding's retry/backoff
+                embeddings[i] = await self.generate_embedding(text)
                 
             except Exception as e:
                 logger.error(f"Failed to embed text: {e}")
-                # Use zero vector as fallback
-                embeddings.append([0.0] * self.config["dimensions"])
         
         return embeddings
     
@@ -236,6 +234,8 @@ class EmbeddingGenerator:
             try:
                 # Generate embeddings for this batch
                 embeddings = await self.generate_embeddings_batch(batch_texts)
+                # The whole batch comes from one API call: stamp it once
+                generated_at = datetime.now().isoformat()
                 
                 # Add embeddings to chunks
                 for chunk, embedding in zip(batch_chunks, embeddings):
@@ -248,12 +248,12 @@ class EmbeddingGenerator:
                         metadata={
                             **chunk.metadata,
                             "embedding_model": self.model,
-                            "embedding_generated_at": datetime.now().isoformat()
+                            "embedding_generated_at": generated_at
                         },
                         token_count=chunk.token_count
                     )
                     
-                    # Add embedding as a separate attribute
+                    # Add embedding as a separate attribute (a row view of the batch array)
                     embedded_chunk.embedding = embedding
                     embedded_chunks.append(embedded_chunk)
                 
@@ -268,12 +268,13 @@ class EmbeddingGenerator:
                 logger.error(f"Failed to process batch {i//self.batch_size + 1}: {e}")
                 
                 # Add chunks without embeddings as fallback
+                error_metadata = {
+                    "embedding_error": str(e),
+                    "embedding_generated_at": datetime.now().isoformat()
+                }
                 for chunk in batch_chunks:
-                    chunk.metadata.update({
-                        "embedding_error": str(e),
-                        "embedding_generated_at": datetime.now().isoformat()
-                    })
-                    chunk.embedding = [0.0] * self.config["dimensions"]
+                    chunk.metadata.update(error_metadata)
+                    chunk.embedding = np.zeros(self.config["dimensions"], dtype=np.float32)
                     embedded_chunks.append(chunk)
         
         logger.info(f"Generated embeddings for {len(embedded_chunks)} chunks")
@@ -302,34 +303,32 @@ class EmbeddingCache:
     
     def __init__(self, max_size: int = 1000):
         """Initialize cache."""
-        self.cache: Dict[str, List[float]] = {}
-        self.access_times: Dict[str, datetime] = {}
+        # Insertion order doubles as recency order: O(1) LRU eviction
+        self.cache: "OrderedDict[str, List[float]]" = OrderedDict()
         self.max_size = max_size
     
     def get(self, text: str) -> Optional[List[float]]:
         """Get embedding from cache."""
         text_hash = self._hash_text(text)
-        if text_hash in self.cache:
-            self.access_times[text_hash] = datetime.now()
-            return self.cache[text_hash]
-        return None
+        embedding = self.cache.get(text_hash)
+        if embedding is not None:
+            self.cache.move_to_end(text_hash)
+        return embedding
     
     def put(self, text: str, embedding: List[float]):
         """Store embedding in cache."""
         text_hash = self._hash_text(text)
         
-        # Evict oldest entries if cache is full
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-            del self.cache[oldest_key]
-            del self.access_times[oldest_key]
+        if text_hash in self.cache:
+            self.cache.move_to_end(text_hash)
+        elif len(self.cache) >= self.max_size:
+            # Evict least recently used entry
+            self.cache.popitem(last=False)
         
         self.cache[text_hash] = embedding
-        self.access_times[text_hash] = datetime.now()
     
     def _hash_text(self, text: str) -> str:
         """Generate hash for text."""
-        import hashlib
         return hashlib.md5(text.encode()).hexdigest()
 
 
@@ -63,17 +63,20 @@ class GraphBuilder:
         
         episodes_created = 0
         errors = []
+        # One ingestion time for all chunks of the document: chunk.index keeps episode ids unique
+        ingested_at = datetime.now(timezone.utc)
+        ingested_ts = ingested_at.timestamp()
         
         for i, chunk in enumerate(chunks):
             try:
-                episode_id = f"{document_source}_{chunk.index}_{datetime.now().timestamp()}"
+                episode_id = f"{document_source}_{chunk.index}_{ingested_ts}"
                 episode_content = self._prepare_episode_content(chunk, document_title)
                 
                 await self.graph_client.add_episode(
                     episode_id=episode_id,
                     content=episode_content,
                     source=f"Doc: {document_title}, Chunk: {chunk.index}",
-                    timestamp=datetime.now(timezone.utc),
+                    timestamp=ingested_at,
                     tenant_id=tenant_id,  # Pass tenant_id
                     metadata={
                         "document_title": document_title,
@@ -4,6 +4,7 @@ Handles tracking, cleanup, and structured citations.
 """
 
 import os
+import asyncio
 import hashlib
 import logging
 import re
@@ -15,21 +16,55 @@ from enum import Enum
 from uuid import UUID
 
 import asyncpg
+import orjson
 from dotenv import load_dotenv
 
 # Import database utilities
 try:
-    from ..agent.db_utils import db_pool
+    from ..agent.db_utils import db_pool, acquire_connection
 except ImportError:
     # For direct execution or testing
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from agent.db_utils import db_pool
+    from agent.db_utils import db_pool, acquire_connection
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Priorità categorie (lower = higher priority)
+# Sistema dinamico: riconosce automaticamente nuove categorie
+CATEGORY_PRIORITIES = {
+    # Aree anatomiche principali (ordine cranio-caudale)
+    'cervicale': 5,
+    'ATM': 8,  # Articolazione temporo-mandibolare
+    'arto_superiore': 15,
+    'toracico': 20,
+    'lombare': 25,
+    'lombo_pelvico': 30,
+    'ginocchio_e_anca': 35,
+    'piede_e_caviglia': 40,
+    
+    # Categorie legacy (backward compatibility)
+    'caviglia_e_piede': 40,
+    'ginocchio': 35,
+    
+    # Fallback
+    'uncategorized': 100
+}
+
+# Pattern matching per categorie anatomiche non predefinite: (termini, priorità), in ordine di verifica
+CATEGORY_PRIORITY_TERMS = (
+    (('cervicale', 'collo', 'neck'), 5),
+    (('atm', 'temporo', 'mandibolare', 'jaw'), 8),
+    (('superiore', 'braccio', 'spalla', 'mano'), 15),
+    (('toracico', 'torace', 'costole'), 20),
+    (('lombare', 'schiena', 'lower_back'), 25),
+    (('pelvico', 'bacino', 'pelvis'), 30),
+    (('ginocchio', 'anca', 'knee', 'hip'), 35),
+    (('piede', 'caviglia', 'foot', 'ankle'), 40),
+)
+
 
 class IngestionAction(Enum):
     """Actions for document ingestion."""
@@ -110,8 +145,8 @@ class IncrementalIngestionManager:
         
         for file_path in document_files:
             try:
-                # Calcola hash e metadati file
-                file_hash = self._calculate_file_hash(file_path)
+                # Calcola hash e metadati file (hash in un thread: non blocca l'event loop sui file grandi)
+                file_hash = await asyncio.to_thread(self._calculate_file_hash, file_path)
                 file_stat = os.stat(file_path)
                 file_size = file_stat.st_size
                 last_modified = datetime.fromtimestamp(file_stat.st_mtime, tz=timezone.utc)
@@ -175,13 +210,10 @@ class IncrementalIngestionManager:
     
     def _calculate_file_hash(self, file_path: str) -> str:
         """Calculate SHA-256 hash of file content."""
-        hash_sha256 = hashlib.sha256()
-        
         try:
+            # file_digest reads in large blocks and hashes without holding the GIL
             with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+                return hashlib.file_digest(f, 'sha256').hexdigest()
         except Exception as e:
             logger.error(f"Error calculating hash for {file_path}: {e}")
             return ""
@@ -239,29 +271,15 @@ class IncrementalIngestionManager:
         Assegna automaticamente priorità a categorie non predefinite.
         Utile per nuove categorie aggiunte dinamicamente.
         """
-        # Pattern matching per categorie anatomiche
         category_lower = category.lower()
         
-        if any(term in category_lower for term in ['cervicale', 'collo', 'neck']):
-            return 5
-        elif any(term in category_lower for term in ['atm', 'temporo', 'mandibolare', 'jaw']):
-            return 8
-        elif any(term in category_lower for term in ['superiore', 'braccio', 'spalla', 'mano']):
-            return 15
-        elif any(term in category_lower for term in ['toracico', 'torace', 'costole']):
-            return 20
-        elif any(term in category_lower for term in ['lombare', 'schiena', 'lower_back']):
-            return 25
-        elif any(term in category_lower for term in ['pelvico', 'bacino', 'pelvis']):
-            return 30
-        elif any(term in category_lower for term in ['ginocchio', 'anca', 'knee', 'hip']):
-            return 35
-        elif any(term in category_lower for term in ['piede', 'caviglia', 'foot', 'ankle']):
-            return 40
-        else:
-            # Categoria sconosciuta - priorità bassa
-            logger.info(f"Auto-assigning low priority to unknown category: {category}")
-            return 90
+        for terms, priority in CATEGORY_PRIORITY_TERMS:
+            if any(term in category_lower for term in terms):
+                return priority
+        
+        # Categoria sconosciuta - priorità bassa
+        logger.info(f"Auto-assigning low priority to unknown category: {category}")
+        return 90
     
     def _extract_order_from_filename(self, filename: str) -> int:
         """
@@ -368,13 +386,14 @@ class IncrementalIngestionManager:
         category: str,
         document_order: int,
         tenant_id: UUID,
-        status: str = 'pending'
+        status: str = 'pending',
+        conn: Optional[asyncpg.Connection] = None
     ) -> int:
-        """Create or update ingestion status record."""
+        """Create or update ingestion status record, reusing `conn` if given."""
         try:
             priority_weight = self.calculate_citation_priority(category, document_order)
 
-            async with db_pool.acquire() as conn:
+            async with acquire_connection(conn) as conn:
                 # Try update first
                 result = await conn.fetchrow("""
                     UPDATE document_ingestion_status
@@ -405,8 +424,61 @@ class IncrementalIngestionManager:
             logger.error(f"Error creating/updating status for {file_path}: {e}")
             raise
     
-    async def update_status(self, status_id: int, **kwargs):
-        """Update specific fields in status record."""
+    async def bulk_create_or_update_status(
+        self,
+        documents: List[DocumentScanResult],
+        tenant_id: UUID,
+        status: str = 'pending'
+    ) -> Dict[str, int]:
+        """
+        Create or update status records for many documents in a single round trip.
+        
+        Returns:
+            Mapping file_path -> status record id
+        """
+        if not documents:
+            return {}
+        
+        # ON CONFLICT non può aggiornare due volte la stessa riga: l'ultima occorrenza di un file vince
+        documents = list({doc.file_path: doc for doc in documents}.values())
+        
+        try:
+            async with db_pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    INSERT INTO document_ingestion_status
+                    (file_path, file_hash, file_size, last_modified, category,
+                     document_order, priority_weight, status, tenant_id)
+                    SELECT file_path, file_hash, file_size, last_modified, category,
+                           document_order, priority_weight, $8, $9
+                    FROM unnest($1::text[], $2::text[], $3::bigint[], $4::timestamptz[],
+                                $5::text[], $6::int[], $7::int[])
+                        AS t(file_path, file_hash, file_size, last_modified, category,
+                             document_order, priority_weight)
+                    ON CONFLICT (tenant_id, file_path) DO UPDATE
+                    SET file_hash = EXCLUDED.file_hash, file_size = EXCLUDED.file_size,
+                        last_modified = EXCLUDED.last_modified, category = EXCLUDED.category,
+                        document_order = EXCLUDED.document_order,
+                        priority_weight = EXCLUDED.priority_weight,
+                        status = EXCLUDED.status, updated_at = NOW()
+                    RETURNING id, file_path
+                """,
+                    [doc.file_path for doc in documents],
+                    [doc.current_hash for doc in documents],
+                    [doc.file_size for doc in documents],
+                    [doc.last_modified for doc in documents],
+                    [doc.category for doc in documents],
+                    [doc.document_order for doc in documents],
+                    [self.calculate_citation_priority(doc.category, doc.document_order) for doc in documents],
+                    status, tenant_id)
+            
+            return {row['file_path']: row['id'] for row in rows}
+            
+        except Exception as e:
+            logger.error(f"Error bulk creating/updating status for {len(documents)} documents: {e}")
+            raise
+    
+    async def update_status(self, status_id: int, conn: Optional[asyncpg.Connection] = None, **kwargs):
+        """Update specific fields in status record, reusing `conn` if given."""
         try:
             if not kwargs:
                 return
@@ -431,24 +503,46 @@ class IncrementalIngestionManager:
             """
             values.append(status_id)
             
-            async with db_pool.acquire() as conn:
+            async with acquire_connection(conn) as conn:
                 await conn.execute(query, *values)
                 
         except Exception as e:
             logger.error(f"Error updating status {status_id}: {e}")
             raise
     
-    async def cleanup_incomplete_ingestion(self, file_path: str):
-        """Pulisce dati di ingestion incompleta."""
+    async def cleanup_incomplete_ingestion(self,
+                                           file_path: str,
+                                           conn: Optional[asyncpg.Connection] = None,
+                                           source: Optional[str] = None,
+                                           tenant_id: Optional[UUID] = None):
+        """
+        Pulisce dati di ingestion incompleta.
+        
+        Con `source` vengono rimossi solo i documenti con quella source esatta: i documenti
+        ingeriti in parallelo con lo stesso nome file (a/notes.md, b/notes.md) non vengono toccati.
+        Senza `source` resta il match per nome file, da usare solo fuori dall'ingestion concorrente.
+        Con `tenant_id` la pulizia è limitata a quel tenant.
+        """
         logger.info(f"Cleaning up incomplete ingestion for: {file_path}")
         
+        if source is not None:
+            doc_filter, doc_args = "source = $1", [source]
+        else:
+            doc_filter, doc_args = "(source = $1 OR source LIKE $2)", [file_path, f"%{os.path.basename(file_path)}"]
+        status_filter, status_args = "file_path = $1", [file_path]
+        if tenant_id is not None:
+            doc_filter += f" AND tenant_id = ${len(doc_args) + 1}"
+            doc_args.append(tenant_id)
+            status_filter += " AND tenant_id = $2"
+            status_args.append(tenant_id)
+        
         try:
-            async with db_pool.acquire() as conn:
+            async with acquire_connection(conn) as conn:
                 async with conn.transaction():
                     # 1. Get document IDs to clean
                     doc_rows = await conn.fetch(
-                        "SELECT id FROM documents WHERE source = $1 OR source LIKE $2",
-                        file_path, f"%{os.path.basename(file_path)}"
+                        f"SELECT id FROM documents WHERE {doc_filter}",
+                        *doc_args
                     )
                     
                     doc_ids = [row['id'] for row in doc_rows]
@@ -456,20 +550,20 @@ class IncrementalIngestionManager:
                     if doc_ids:
                         # 2. Remove chunks
                         chunks_deleted = await conn.fetchval(
-                            "DELETE FROM chunks WHERE document_id = ANY($1) RETURNING COUNT(*)",
+                            "WITH deleted AS (DELETE FROM chunks WHERE document_id = ANY($1) RETURNING 1) SELECT COUNT(*) FROM deleted",
                             doc_ids
                         )
                         logger.info(f"Deleted {chunks_deleted or 0} chunks")
                         
                         # 3. Remove documents
                         docs_deleted = await conn.fetchval(
-                            "DELETE FROM documents WHERE id = ANY($1) RETURNING COUNT(*)",
+                            "WITH deleted AS (DELETE FROM documents WHERE id = ANY($1) RETURNING 1) SELECT COUNT(*) FROM deleted",
                             doc_ids
                         )
                         logger.info(f"Deleted {docs_deleted or 0} documents")
                     
                     # 4. Reset ingestion status
-                    await conn.execute("""
+                    await conn.execute(f"""
                         UPDATE document_ingestion_status 
                         SET status = 'pending', 
                             chunks_created = 0,
@@ -479,8 +573,8 @@ class IncrementalIngestionManager:
                             ingestion_started_at = NULL,
                             ingestion_completed_at = NULL,
                             updated_at = NOW()
-                        WHERE file_path = $1
-                    """, file_path)
+                        WHERE {status_filter}
+                    """, *status_args)
                     
             logger.info(f"✓ Cleanup completed for: {file_path}")
                     
@@ -491,72 +585,59 @@ class IncrementalIngestionManager:
     def calculate_citation_priority(self, category: str, document_order: int) -> int:
         """Calcola priorità per ordinamento citazioni."""
         
-        # Priorità categorie (lower = higher priority)
-        # Sistema dinamico: riconosce automaticamente nuove categorie
-        category_priorities = {
-            # Aree anatomiche principali (ordine cranio-caudale)
-            'cervicale': 5,
-            'ATM': 8,  # Articolazione temporo-mandibolare
-            'arto_superiore': 15,
-            'toracico': 20,
-            'lombare': 25,
-            'lombo_pelvico': 30,
-            'ginocchio_e_anca': 35,
-            'piede_e_caviglia': 40,
-            
-            # Categorie legacy (backward compatibility)
-            'caviglia_e_piede': 40,
-            'ginocchio': 35,
-            
-            # Fallback
-            'uncategorized': 100
-        }
-        
-        base_priority = category_priorities.get(category, self._auto_assign_category_priority(category))
+        # Tabella costante a livello di modulo; il pattern matching solo per categorie non predefinite
+        base_priority = CATEGORY_PRIORITIES.get(category)
+        if base_priority is None:
+            base_priority = self._auto_assign_category_priority(category)
         return base_priority + document_order  # 11, 12, 13... per categoria
     
     async def get_ingestion_report(self) -> Dict[str, Any]:
         """Generate comprehensive ingestion status report."""
         try:
             async with db_pool.acquire() as conn:
-                # Overall statistics
-                overall_stats = await conn.fetchrow("""
-                    SELECT 
-                        COUNT(*) as total_documents,
-                        COUNT(*) FILTER (WHERE status = 'completed') as completed,
-                        COUNT(*) FILTER (WHERE status = 'partial') as partial,
-                        COUNT(*) FILTER (WHERE status = 'failed') as failed,
-                        COUNT(*) FILTER (WHERE status = 'processing') as processing,
-                        COUNT(*) FILTER (WHERE status = 'pending') as pending
-                    FROM document_ingestion_status
-                """)
-                
-                # Category breakdown
-                category_stats = await conn.fetch("""
-                    SELECT 
-                        category,
-                        COUNT(*) as total,
-                        COUNT(*) FILTER (WHERE status = 'completed') as completed,
-                        COUNT(*) FILTER (WHERE status != 'completed') as incomplete
-                    FROM document_ingestion_status
-                    WHERE category IS NOT NULL
-                    GROUP BY category
-                    ORDER BY category
-                """)
-                
-                # Problem documents
-                problem_docs = await conn.fetch("""
-                    SELECT file_path, status, category, document_order, updated_at
-                    FROM document_ingestion_status
-                    WHERE status IN ('failed', 'partial', 'processing')
-                    ORDER BY category, document_order
+                # Statistiche generali, per categoria e documenti problematici in un solo round trip
+                report = await conn.fetchval("""
+                    SELECT json_build_object(
+                        'overall', (
+                            SELECT row_to_json(stats) FROM (
+                                SELECT 
+                                    COUNT(*) as total_documents,
+                                    COUNT(*) FILTER (WHERE status = 'completed') as completed,
+                                    COUNT(*) FILTER (WHERE status = 'partial') as partial,
+                                    COUNT(*) FILTER (WHERE status = 'failed') as failed,
+                                    COUNT(*) FILTER (WHERE status = 'processing') as processing,
+                                    COUNT(*) FILTER (WHERE status = 'pending') as pending
+                                FROM document_ingestion_status
+                            ) stats
+                        ),
+                        'by_category', COALESCE((
+                            SELECT json_agg(category_stats ORDER BY category_stats.category) FROM (
+                                SELECT 
+                                    category,
+                                    COUNT(*) as total,
+                                    COUNT(*) FILTER (WHERE status = 'completed') as completed,
+                                    COUNT(*) FILTER (WHERE status != 'completed') as incomplete
+                                FROM document_ingestion_status
+                                WHERE category IS NOT NULL
+                                GROUP BY category
+                            ) category_stats
+                        ), '[]'::json),
+                        'problem_documents', COALESCE((
+                            SELECT json_agg(problem_docs ORDER BY problem_docs.category, problem_docs.document_order) FROM (
+                                SELECT file_path, status, category, document_order, updated_at
+                                FROM document_ingestion_status
+                                WHERE status IN ('failed', 'partial', 'processing')
+                            ) problem_docs
+                        ), '[]'::json)
+                    )
                 """)
                 
-                return {
-                    'overall': dict(overall_stats) if overall_stats else {},
-                    'by_category': [dict(row) for row in category_stats],
-                    'problem_documents': [dict(row) for row in problem_docs]
-                }
+                result = orjson.loads(report)
+                # JSON carries timestamps as ISO strings: return datetimes, as the row-based report did
+                for doc in result['problem_documents']:
+                    if doc['updated_at'] is not None:
+                        doc['updated_at'] = datetime.fromisoformat(doc['updated_at'])
+                return result
                 
         except Exception as e:
             logger.error(f"Error generating ingestion report: {e}")
@@ -570,12 +651,12 @@ class IncrementalIngestionManager:
             async with db_pool.acquire() as conn:
                 # Get all files in category
                 files = await conn.fetch(
-                    "SELECT file_path FROM document_ingestion_status WHERE category = $1",
+                    "SELECT file_path, tenant_id FROM document_ingestion_status WHERE category = $1",
                     category
                 )
                 
                 for file_row in files:
-                    await self.cleanup_incomplete_ingestion(file_row['file_path'])
+                    await self.cleanup_incomplete_ingestion(file_row['file_path'], tenant_id=file_row['tenant_id'])
                 
                 logger.info(f"✓ Category cleanup completed: {category}")
                 
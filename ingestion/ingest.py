@@ -3,39 +3,69 @@ Main ingestion script for processing markdown documents into vector DB and knowl
 """
 
 import os
+import mmap
 import asyncio
 import logging
-import json
 import glob
+import hashlib
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import argparse
+import multiprocessing
 from uuid import UUID
+from concurrent.futures import ProcessPoolExecutor
 
 import asyncpg
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 
 from .chunker import ChunkingConfig, create_chunker, DocumentChunk
 from .embedder import create_embedder
 from .graph_builder import create_graph_builder
-from .docx_processor import create_docx_processor
-from .incremental_manager import create_incremental_manager, IngestionAction
+from .docx_processor import create_docx_processor, process_docx_file
+from .incremental_manager import create_incremental_manager, IngestionAction, DocumentScanResult
 
 try:
-    from agent.db_utils import initialize_database, close_database, db_pool
+    from agent.db_utils import initialize_database, close_database, db_pool, acquire_connection
     from agent.graph_utils import initialize_graph, close_graph
     from agent.models import IngestionConfig, IngestionResult
+    from agent.providers import get_embedding_provider
 except (ImportError, ValueError):
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from agent.db_utils import initialize_database, close_database, db_pool
+    from agent.db_utils import initialize_database, close_database, db_pool, acquire_connection
     from agent.graph_utils import initialize_graph, close_graph
     from agent.models import IngestionConfig, IngestionResult
+    from agent.providers import get_embedding_provider
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Document and chunk metadata may carry numpy values and non-string keys
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+@dataclass(slots=True)
+class PathInfo:
+    """Path-derived values of a document, computed once per ingestion."""
+    abs: str
+    rel: str
+    title: str
+    ext: str
+
+    @classmethod
+    def from_path(cls, file_path: str, documents_folder: str) -> "PathInfo":
+        stem, ext = os.path.splitext(os.path.basename(file_path))
+        return cls(
+            abs=file_path,
+            rel=os.path.relpath(file_path, documents_folder),
+            title=stem,
+            ext=ext.lower()
+        )
+
 
 class DocumentIngestionPipeline:
     """Pipeline for ingesting documents into vector DB and knowledge graph."""
@@ -49,6 +79,12 @@ class DocumentIngestionPipeline:
         self.graph_builder = create_graph_builder()
         self.docx_processor = create_docx_processor()
         self.incremental_manager = create_incremental_manager()
+        self._tenant_cache: Dict[str, UUID] = {}
+        # Turned off in initialize() when the embedding_cache table is not deployed
+        self._use_embedding_cache = config.use_embedding_cache
+        # DOCX parsing is pure-Python CPU work: run it in worker processes so concurrent documents are not serialized on the GIL.
+        # Created on the first DOCX only, see _get_parse_pool()
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
         self._initialized = False
 
     async def initialize(self):
@@ -56,9 +92,14 @@ class DocumentIngestionPipeline:
             await initialize_database()
             await self.graph_builder.initialize()
             await self.incremental_manager.initialize()
+            if self._use_embedding_cache:
+                self._use_embedding_cache = await self._embedding_cache_available()
             self._initialized = True
 
     async def close(self):
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
         if self._initialized:
             await self.graph_builder.close()
             await close_database()
@@ -75,65 +116,78 @@ class DocumentIngestionPipeline:
             # Se puliamo tutto, forziamo la re-ingestione di tutto.
             # La logica incrementale gestirà questo come "INGEST" per ogni file.
 
-        results = []
         scanned_documents = await self.incremental_manager.scan_documents(self.documents_folder, tenant_id)
 
         for doc in scanned_documents:
-            action = doc.action
-            file_path = doc.file_path
+            if doc.action == IngestionAction.SKIP:
+                logger.info(f"Skipping {doc.file_path}: {doc.reason}")
+        pending_documents = [doc for doc in scanned_documents if doc.action != IngestionAction.SKIP]
 
-            if action == IngestionAction.SKIP:
-                logger.info(f"Skipping {file_path}: {doc.reason}")
-                continue
+        # Documents are I/O bound (DB, embedding API, graph): run a bounded number at once
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_documents)
 
-            status_id = await self.incremental_manager.create_or_update_status(
-                file_path=file_path,
-                file_hash=doc.current_hash,
-                file_size=doc.file_size,
-                last_modified=doc.last_modified,
-                category=doc.category,
-                document_order=doc.document_order,
-                tenant_id=tenant_id,
-                status='processing'
-            )
+        # Record every document as 'processing' in one round trip before starting
+        status_ids = await self.incremental_manager.bulk_create_or_update_status(
+            pending_documents, tenant_id, status='processing'
+        )
 
-            try:
-                if action == IngestionAction.CLEANUP_AND_REINGEST:
-                    logger.info(f"Cleaning up before re-ingesting {file_path}")
-                    await self.incremental_manager.cleanup_incomplete_ingestion(file_path)
+        async def process_with_limit(doc: DocumentScanResult) -> IngestionResult:
+            async with semaphore:
+                return await self._process_scanned_document(doc, tenant_id, status_ids[doc.file_path])
 
-                result = await self._ingest_single_document(file_path, tenant_id)
-                results.append(result)
+        results = await asyncio.gather(*(process_with_limit(doc) for doc in pending_documents))
 
-                if result.success:
-                    await self.incremental_manager.update_status(status_id, status='completed', chunks_created=result.chunks_created, graph_episodes_created=result.relationships_created)
-                else:
-                    await self.incremental_manager.update_status(status_id, status='failed')
+        if self.clean_before_ingest:
+            # Tables were refilled from empty: refresh planner statistics now rather than
+            # waiting for autovacuum, so the first searches don't run on stale estimates
+            async with db_pool.acquire() as conn:
+                await conn.execute("ANALYZE documents, chunks")
+
+        return results
+
+    async def _process_scanned_document(self, doc: DocumentScanResult, tenant_id: UUID, status_id: int) -> IngestionResult:
+        """Ingest one scanned document, keeping its ingestion status record up to date."""
+        file_path = doc.file_path
+
+        try:
+            result = await self._ingest_single_document(
+                file_path,
+                tenant_id,
+                cleanup_first=doc.action == IngestionAction.CLEANUP_AND_REINGEST,
+                status_id=status_id
+            )
 
-            except Exception as e:
-                logger.error(f"Failed to process {file_path}: {e}", exc_info=True)
+            if result.success:
+                await self.incremental_manager.update_status(status_id, status='completed', chunks_created=result.chunks_created, graph_episodes_created=result.relationships_created)
+            else:
                 await self.incremental_manager.update_status(status_id, status='failed')
-                results.append(IngestionResult(
-                    document_id="",
-                    title=os.path.basename(file_path),
-                    success=False,
-                    chunks_created=0,
-                    entities_extracted=0,
-                    relationships_created=0,
-                    processing_time_ms=0,
-                    errors=[str(e)]
-                ))
+            return result
 
-        return results
+        except Exception as e:
+            # The Postgres rows of the document roll back, but the knowledge graph is not
+            # transactional: episodes already written by the graph task stay in Neo4j
+            logger.error(f"Failed to process {file_path}: {e}", exc_info=True)
+            await self.incremental_manager.update_status(status_id, status='failed')
+            return IngestionResult(
+                document_id="",
+                title=os.path.basename(file_path),
+                success=False,
+                chunks_created=0,
+                entities_extracted=0,
+                relationships_created=0,
+                processing_time_ms=0,
+                errors=[str(e)]
+            )
 
-    async def _ingest_single_document(self, file_path: str, tenant_id: UUID) -> IngestionResult:
+    async def _ingest_single_document(self, file_path: str, tenant_id: UUID, cleanup_first: bool = False, status_id: Optional[int] = None) -> IngestionResult:
         start_time = datetime.now()
-        document_data = self._read_document(file_path)
+        path_info = PathInfo.from_path(file_path, self.documents_folder)
+        document_data = await self._read_document(path_info)
         
         chunks = await self.chunker.chunk_document(
             content=document_data["content"],
             title=document_data["title"],
-            source=os.path.relpath(file_path, self.documents_folder)
+            source=path_info.rel
         )
         
         if not chunks:
@@ -148,25 +202,44 @@ class DocumentIngestionPipeline:
                 errors=["No chunks created"]
             )
 
-        embedded_chunks = await self.embedder.embed_chunks(chunks)
+        unique_chunks, unique_keys, representative_idx = self._deduplicate_chunks(chunks)
+        if len(unique_chunks) < len(chunks):
+            logger.info(f"Embedding {len(unique_chunks)}/{len(chunks)} unique chunks ({1 - len(unique_chunks) / len(chunks):.0%} duplicates)")
+        if self._use_embedding_cache:
+            embedded_unique = await self._embed_with_cache(unique_chunks, unique_keys)
+        else:
+            embedded_unique = await self.embedder.embed_chunks(unique_chunks)
+        embedded_chunks = self._expand_duplicate_chunks(chunks, embedded_unique, representative_idx)
         
-        document_id = await self._save_to_postgres(
-            document_data["title"],
-            os.path.relpath(file_path, self.documents_folder),
-            document_data["content"],
-            embedded_chunks,
-            document_data.get("metadata", {}),
-            tenant_id
-        )
-
+        # Postgres and the knowledge graph are independent backends: write to both concurrently.
+        # A failure in either cancels the other and is re-raised as-is.
         graph_result = {"episodes_created": 0, "errors": []}
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                save_task = task_group.create_task(self._replace_in_postgres(
+                    file_path,
+                    cleanup_first,
+                    status_id,
+                    document_data["title"],
+                    path_info.rel,
+                    document_data["content"],
+                    embedded_chunks,
+                    document_data.get("metadata", {}),
+                    tenant_id
+                ))
+                if not self.config.skip_graph_building:
+                    graph_task = task_group.create_task(self.graph_builder.add_document_to_graph(
+                        chunks=embedded_chunks,
+                        document_title=document_data["title"],
+                        document_source=path_info.rel,
+                        tenant_id=tenant_id
+                    ))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
+
+        document_id = save_task.result()
         if not self.config.skip_graph_building:
-            graph_result = await self.graph_builder.add_document_to_graph(
-                chunks=embedded_chunks,
-                document_title=document_data["title"],
-                document_source=os.path.relpath(file_path, self.documents_folder),
-                tenant_id=tenant_id
-            )
+            graph_result = graph_task.result()
 
         processing_time = (datetime.now() - start_time).total_seconds() * 1000
         return IngestionResult(
@@ -182,36 +255,184 @@ class DocumentIngestionPipeline:
 
 
 
-    def _read_document(self, file_path: str) -> Dict[str, Any]:
-        file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext == '.docx':
-            return self.docx_processor.process_docx_file(file_path)
+    async def _embedding_cache_available(self) -> bool:
+        """Check that embedding_cache exists: databases deployed before it need sql/embedding_cache_schema.sql."""
+        async with db_pool.acquire() as conn:
+            available = await conn.fetchval("SELECT to_regclass('public.embedding_cache') IS NOT NULL")
+        if not available:
+            logger.warning("embedding_cache table not found, embedding cache disabled (run scripts/deploy_embedding_cache.py to enable it)")
+        return available
+
+    async def _replace_in_postgres(self, file_path: str, cleanup_first: bool, status_id: Optional[int], title: str, source: str, content: str, chunks: List[DocumentChunk], metadata: Dict[str, Any], tenant_id: UUID) -> UUID:
+        """Remove the previous version of the document and save the new one in a single short transaction."""
+        async with db_pool.acquire() as conn:
+            # Opened only once embeddings are ready: no locks are held across embedding API calls
+            async with conn.transaction():
+                # Bulk load: don't wait for the WAL flush on commit. A crash can lose the last
+                # few documents, but their status row is lost with them, so they are re-ingested.
+                await conn.execute("SET LOCAL synchronous_commit = off")
+
+                if cleanup_first:
+                    logger.info(f"Cleaning up before re-ingesting {file_path}")
+                    # Exact source and tenant: documents with the same file name run concurrently
+                    await self.incremental_manager.cleanup_incomplete_ingestion(file_path, conn=conn, source=source, tenant_id=tenant_id)
+
+                document_id = await self._save_to_postgres(title, source, content, chunks, metadata, tenant_id, conn=conn)
+
+                if status_id is not None:
+                    # Cleanup resets the status to 'pending': commit the new chunks as still 'processing',
+                    # so an interruption before the graph finishes is re-ingested with a cleanup
+                    await self.incremental_manager.update_status(status_id, conn=conn, status='processing', chunks_created=len(chunks))
+                return document_id
+
+    async def _embed_with_cache(self, chunks: List[DocumentChunk], hashes: List[bytes]) -> List[DocumentChunk]:
+        """Embed chunks, reusing embeddings persisted in embedding_cache (keyed by content hash) and storing new ones."""
+        provider = get_embedding_provider()
+        model = self.embedder.model
+
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT hash, embedding FROM embedding_cache WHERE hash = ANY($1) AND provider = $2 AND model = $3",
+                hashes, provider, model
+            )
+        cached = {bytes(row['hash']): np.asarray(row['embedding'], dtype=np.float32) for row in rows}
+
+        uncached_chunks = [chunk for chunk, key in zip(chunks, hashes) if key not in cached]
+        logger.info(f"Embedding cache: {len(chunks) - len(uncached_chunks)}/{len(chunks)} hits")
+        embedded_uncached = iter(await self.embedder.embed_chunks(uncached_chunks))
+
+        embedded_chunks = []
+        new_entries = []
+        for chunk, key in zip(chunks, hashes):
+            embedding = cached.get(key)
+            if embedding is not None:
+                embedded_chunk = replace(chunk, metadata={**chunk.metadata, "embedding_model": model, "embedding_cached": True})
+                embedded_chunk.embedding = embedding
+            else:
+                embedded_chunk = next(embedded_uncached)
+                # Failed embeddings come back as zero vectors (a failed batch, or a text the embedder's
+                # per-text fallback could not embed): caching them would make the failure permanent
+                if "embedding_error" not in embedded_chunk.metadata and embedded_chunk.embedding.any():
+                    new_entries.append((key, provider, model, embedded_chunk.embedding))
+            embedded_chunks.append(embedded_chunk)
+
+        if new_entries:
+            # Own autocommit connection, keys in a fixed order: concurrent documents inserting
+            # the same new hashes wait at most one statement for each other and cannot deadlock
+            new_entries.sort(key=lambda entry: entry[0])
+            async with db_pool.acquire() as conn:
+                await conn.executemany(
+                    "INSERT INTO embedding_cache (hash, provider, model, embedding) VALUES ($1, $2, $3, $4) ON CONFLICT DO NOTHING",
+                    new_entries
+                )
+
+        return embedded_chunks
+
+    @staticmethod
+    def _content_key(content: str) -> bytes:
+        """Hash of the exact text sent to the embedder; shared by deduplication and embedding_cache."""
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+    def _deduplicate_chunks(self, chunks: List[DocumentChunk]) -> Tuple[List[DocumentChunk], List[bytes], List[int]]:
+        """Return the unique chunks, their content keys and, for every chunk, the position of its unique representative."""
+        unique_chunks: List[DocumentChunk] = []
+        unique_keys: List[bytes] = []
+        representative_idx: List[int] = []
+        seen: Dict[bytes, int] = {}
+        for chunk in chunks:
+            key = self._content_key(chunk.content)
+            idx = seen.get(key)
+            if idx is None:
+                idx = seen[key] = len(unique_chunks)
+                unique_chunks.append(chunk)
+                unique_keys.append(key)
+            representative_idx.append(idx)
+        return unique_chunks, unique_keys, representative_idx
+
+    def _expand_duplicate_chunks(self, chunks: List[DocumentChunk], embedded_unique: List[DocumentChunk], representative_idx: List[int]) -> List[DocumentChunk]:
+        """Fan embeddings of the unique chunks back out to every chunk, preserving order."""
+        embedded_chunks = []
+        for chunk, idx in zip(chunks, representative_idx):
+            representative = embedded_unique[idx]
+            if representative.index == chunk.index:
+                embedded_chunks.append(representative)
+                continue
+            # Keep the duplicate's own metadata; take what the embedder added from its representative
+            duplicate = replace(chunk, metadata={**representative.metadata, **chunk.metadata})
+            duplicate.embedding = representative.embedding
+            embedded_chunks.append(duplicate)
+        return embedded_chunks
+
+    async def _read_document(self, path_info: PathInfo) -> Dict[str, Any]:
+        if path_info.ext == '.docx':
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_parse_pool(), process_docx_file, path_info.abs)
         else:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            return {"title": os.path.splitext(os.path.basename(file_path))[0], "content": content}
+            content = self._read_text_file(path_info.abs)
+            return {"title": path_info.title, "content": content}
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        """Worker pool for DOCX parsing, started on first use."""
+        if self._parse_pool is None:
+            # spawn, not fork: by now asyncio, asyncpg and the Neo4j driver are running threads
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, self.config.max_concurrent_documents),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._parse_pool
+
+    def _read_text_file(self, file_path: str) -> str:
+        """Read a text/markdown file via mmap, decoding UTF-8 with a latin-1 fallback."""
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Large files are read front-to-back once: let the kernel read ahead
+                if file_size > 1024 * 1024 and hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                # Decode straight from the mapping: no intermediate bytes copy of the file
+                try:
+                    return str(mm, 'utf-8')
+                except UnicodeDecodeError:
+                    logger.warning(f"{file_path} is not valid UTF-8, decoding as latin-1")
+                    return str(mm, 'latin-1')
 
     async def _get_tenant_id_from_slug(self, slug: str) -> UUID:
+        if slug in self._tenant_cache:
+            return self._tenant_cache[slug]
         async with db_pool.acquire() as conn:
             tenant = await conn.fetchrow("SELECT id FROM accounts_tenant WHERE slug = $1", slug)
             if tenant:
+                self._tenant_cache[slug] = tenant['id']
                 return tenant['id']
             raise ValueError(f"Tenant with slug '{slug}' not found.")
 
-    async def _save_to_postgres(self, title: str, source: str, content: str, chunks: List[DocumentChunk], metadata: Dict[str, Any], tenant_id: UUID) -> UUID:
-        async with db_pool.acquire() as conn:
+    async def _save_to_postgres(self, title: str, source: str, content: str, chunks: List[DocumentChunk], metadata: Dict[str, Any], tenant_id: UUID, conn: Optional[asyncpg.Connection] = None) -> UUID:
+        async with acquire_connection(conn) as conn:
             async with conn.transaction():
                 document_result = await conn.fetchrow(
                     "INSERT INTO documents (tenant_id, title, source, content, metadata) VALUES ($1, $2, $3, $4, $5) RETURNING id",
-                    tenant_id, title, source, content, json.dumps(metadata)
+                    tenant_id, title, source, content, orjson.dumps(metadata, option=_ORJSON_OPTIONS).decode()
                 )
                 document_id = document_result["id"]
-                for chunk in chunks:
-                    embedding_data = '[' + ','.join(map(str, chunk.embedding)) + ']' if hasattr(chunk, 'embedding') and chunk.embedding else None
-                    await conn.execute(
-                        "INSERT INTO chunks (tenant_id, document_id, content, embedding, chunk_index, metadata) VALUES ($1, $2, $3, $4::vector, $5, $6)",
-                        tenant_id, document_id, chunk.content, embedding_data, chunk.index, json.dumps(chunk.metadata)
+                # Embeddings go over the wire through the binary pgvector codec (see agent.db_utils)
+                records = (
+                    (
+                        tenant_id,
+                        document_id,
+                        chunk.content,
+                        chunk.embedding,
+                        chunk.index,
+                        orjson.dumps(chunk.metadata, option=_ORJSON_OPTIONS).decode()
                     )
+                    for chunk in chunks
+                )
+                await conn.copy_records_to_table(
+                    'chunks',
+                    records=records,
+                    columns=['tenant_id', 'document_id', 'content', 'embedding', 'chunk_index', 'metadata']
+                )
                 return document_id
 
     async def _clean_databases(self):
@@ -234,4 +455,10 @@ async def main():
     await pipeline.close()
 
 if __name__ == "__main__":
+    # Ingestion is thousands of small awaited asyncpg/HTTP calls: use uvloop when it is installed
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
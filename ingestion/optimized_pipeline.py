@@ -3,14 +3,26 @@ Pipeline ottimizzata per gestione file grandi con elaborazione progressiva.
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from pathlib import Path
 
+import asyncpg
+import numpy as np
+
 from .streaming_docx_processor import StreamingDOCXProcessor, DocumentSection
 from .chunker import DocumentChunk, ChunkingConfig
 from .section_recovery_manager import create_section_recovery_manager
 
+try:
+    from ..agent.db_utils import db_pool
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from agent.db_utils import db_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,18 +34,27 @@ class OptimizedIngestionPipeline:
                  chunker,
                  embedder,
                  graph_builder,
-                 streaming_threshold: int = 5 * 1024 * 1024):  # 5MB
+                 streaming_threshold: int = 5 * 1024 * 1024,  # 5MB
+                 max_batch_tokens: int = 8192,
+                 status_flush_size: int = 32,
+                 section_prefetch: int = 4):
         """
         Initialize optimized pipeline.
         
         Args:
             streaming_threshold: Soglia dimensione file per streaming (bytes)
+            max_batch_tokens: Token (stimati) accumulati tra sezioni prima di generare embeddings
+            status_flush_size: Sezioni con status bufferizzato prima di scriverle su DB
+            section_prefetch: Sezioni lette in anticipo dal parser DOCX mentre si generano embeddings
         """
         self.streaming_processor = streaming_processor
         self.chunker = chunker
         self.embedder = embedder
         self.graph_builder = graph_builder
         self.streaming_threshold = streaming_threshold
+        self.max_batch_tokens = max_batch_tokens
+        self.status_flush_size = status_flush_size
+        self.section_prefetch = section_prefetch
         self.section_recovery = create_section_recovery_manager()
     
     async def process_large_document(self, file_path: str, document_status_id: int) -> Dict[str, Any]:
@@ -56,87 +77,54 @@ class OptimizedIngestionPipeline:
         await self.section_recovery.initialize()
         
         if use_streaming:
-            return await self._process_streaming(file_path, document_status_id)
+            # One connection serves every section insert and status flush of this document
+            async with db_pool.acquire() as conn:
+                return await self._process_streaming(file_path, document_status_id, conn)
         else:
             return await self._process_standard(file_path, document_status_id)
     
-    async def _process_streaming(self, file_path: str, document_status_id: int) -> Dict[str, Any]:
+    async def _process_streaming(self, file_path: str, document_status_id: int, conn: Optional[asyncpg.Connection] = None) -> Dict[str, Any]:
         """Process document with streaming approach."""
         
-        total_chunks = 0
-        total_entities = 0
-        total_episodes = 0
+        totals = {'chunks_created': 0, 'entities_extracted': 0, 'episodes_created': 0}
         errors = []
         processed_sections = 0
         
+        # Sections and their chunks are buffered so each embedding call is well filled
+        # and the sections of a batch are tracked with a single insert
+        pending_sections: List[Tuple[DocumentSection, List[DocumentChunk]]] = []
+        pending_tokens = 0
+        batch_count = 0
+        
         try:
             # Process document sections progressively with granular tracking
-            for section in self.streaming_processor.process_docx_streaming(file_path):
-                processed_sections += 1
-                
-                # Track section for recovery
-                section_id = await self.section_recovery.track_section(
-                    document_status_id=document_status_id,
-                    section_position=section.position,
-                    section_type=section.section_type,
-                    content=section.content,
-                    metadata=section.metadata
-                )
-                
-                try:
-                    # Update section status to processing
-                    await self.section_recovery.update_section_status(section_id, 'processing')
+            async with aclosing(self._prefetch_sections(file_path)) as sections:
+                async for section in sections:
+                    processed_sections += 1
                     
                     # Create chunks from section
                     section_chunks = await self._create_section_chunks(section)
-                    
-                    if section_chunks:
-                        # Process chunks batch by batch
-                        batch_results = await self._process_chunks_batch(
-                            section_chunks, 
-                            f"{Path(file_path).stem}_section_{processed_sections}"
-                        )
-                        
-                        # Update section status to completed
-                        await self.section_recovery.update_section_status(
-                            section_id, 
-                            'completed',
-                            chunks_created=batch_results.get('chunks_created', 0),
-                            entities_extracted=batch_results.get('entities_extracted', 0),
-                            graph_episodes_created=batch_results.get('episodes_created', 0)
-                        )
-                        
-                        total_chunks += batch_results.get('chunks_created', 0)
-                        total_entities += batch_results.get('entities_extracted', 0)
-                        total_episodes += batch_results.get('episodes_created', 0)
-                        
-                        if batch_results.get('errors'):
-                            errors.extend(batch_results['errors'])
+                    pending_sections.append((section, section_chunks))
+                    pending_tokens += sum(self._estimate_tokens(chunk) for chunk in section_chunks)
                     
                     # Log progress every 10 sections
                     if processed_sections % 10 == 0:
-                        logger.info(f"📊 Progress: {processed_sections} sections, {total_chunks} chunks created")
-                
-                except Exception as e:
-                    error_msg = f"Section {processed_sections} failed: {str(e)}"
-                    logger.warning(error_msg)
-                    errors.append(error_msg)
+                        logger.info(f"📊 Progress: {processed_sections} sections, {totals['chunks_created']} chunks created")
                     
-                    # Update section status to failed with error message
-                    await self.section_recovery.update_section_status(
-                        section_id, 
-                        'failed',
-                        error_message=error_msg
-                    )
-                    continue  # Continue with next section
+                    if pending_tokens >= self.max_batch_tokens:
+                        batch_count += 1
+                        await self._flush_sections(document_status_id, pending_sections, f"{Path(file_path).stem}_batch_{batch_count}", totals, errors, conn)
+                        pending_sections, pending_tokens = [], 0
+            
+            if pending_sections:
+                batch_count += 1
+                await self._flush_sections(document_status_id, pending_sections, f"{Path(file_path).stem}_batch_{batch_count}", totals, errors, conn)
             
             logger.info(f"✅ Streaming completed: {processed_sections} sections processed")
             
             return {
                 'success': True,
-                'chunks_created': total_chunks,
-                'entities_extracted': total_entities,
-                'episodes_created': total_episodes,
+                **totals,
                 'sections_processed': processed_sections,
                 'errors': errors
             }
@@ -146,14 +134,145 @@ class OptimizedIngestionPipeline:
             return {
                 'success': False,
                 'error': str(e),
-                'chunks_created': total_chunks,
+                'chunks_created': totals['chunks_created'],
                 'sections_processed': processed_sections,
                 'errors': errors + [str(e)]
             }
+        
+        finally:
+            await self._flush_section_statuses(conn)
+    
+    async def _prefetch_sections(self, file_path: str) -> AsyncIterator[DocumentSection]:
+        """Yield document sections while the next ones are parsed in a worker thread (bounded read-ahead)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.section_prefetch)
+        sections = iter(self.streaming_processor.process_docx_streaming(file_path))
+        next_section: Optional[asyncio.Future] = None
+
+        async def produce():
+            nonlocal next_section
+            try:
+                while True:
+                    # Shielded: cancelling the producer must not lose track of a next() still running in the thread
+                    next_section = asyncio.ensure_future(asyncio.to_thread(next, sections, None))
+                    if (section := await asyncio.shield(next_section)) is None:
+                        break
+                    await queue.put(section)
+                await queue.put(None)
+            except Exception as e:
+                # Hand parser failures to the consumer, which re-raises them
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            # On early exit, let the worker thread finish its next() and close the parser (and its DOCX file)
+            if next_section is not None:
+                await asyncio.gather(next_section, return_exceptions=True)
+            if hasattr(sections, 'close'):
+                sections.close()
+
+    async def _flush_sections(self,
+                              document_status_id: int,
+                              pending_sections: List[Tuple[DocumentSection, List[DocumentChunk]]],
+                              batch_name: str,
+                              totals: Dict[str, int],
+                              errors: List[str],
+                              conn: Optional[asyncpg.Connection] = None):
+        """Track the buffered sections, embed their chunks at once, then mark those sections done."""
+        # Track sections for recovery
+        section_ids = await self.section_recovery.track_sections_bulk(
+            document_status_id,
+            [(section.position, section.section_type, section.content, section.metadata)
+             for section, _ in pending_sections],
+            conn=conn
+        )
+        for section_id in section_ids:
+            await self._set_section_status(section_id, 'processing', conn=conn)
+        
+        batch_chunks = [chunk for _, section_chunks in pending_sections for chunk in section_chunks]
+        batch_results = await self._process_chunks_batch(batch_chunks, batch_name)
+        
+        if batch_results.get('errors') and len(pending_sections) > 1:
+            # A bad section must not fail the sections buffered with it: retry them one at a time
+            # so only the ones that fail again are marked failed (and later recovered)
+            logger.warning(f"{batch_name} failed, retrying its {len(pending_sections)} sections individually")
+            for section_id, (section, section_chunks) in zip(section_ids, pending_sections):
+                section_name = f"{batch_name}_section_{section.position}"
+                section_results = await self._process_chunks_batch(section_chunks, section_name)
+                await self._record_results([section_id], [(section, section_chunks)], section_results, section_name, totals, errors, conn)
+            return
+        
+        await self._record_results(section_ids, pending_sections, batch_results, batch_name, totals, errors, conn)
+    
+    async def _record_results(self,
+                              section_ids: List[int],
+                              sections: List[Tuple[DocumentSection, List[DocumentChunk]]],
+                              results: Dict[str, Any],
+                              name: str,
+                              totals: Dict[str, int],
+                              errors: List[str],
+                              conn: Optional[asyncpg.Connection] = None):
+        """Mark the sections of a processed batch completed or failed and add their counts to the totals."""
+        if results.get('errors'):
+            errors.extend(results['errors'])
+            error_msg = f"{name} failed: {'; '.join(results['errors'])}"
+            for section_id in section_ids:
+                await self._set_section_status(section_id, 'failed', conn=conn, error_message=error_msg)
+            return
+        
+        for section_id, (_, section_chunks) in zip(section_ids, sections):
+            await self._set_section_status(
+                section_id,
+                'completed',
+                conn=conn,
+                chunks_created=len(section_chunks)
+            )
+        
+        totals['chunks_created'] += results.get('chunks_created', 0)
+        totals['entities_extracted'] += results.get('entities_extracted', 0)
+        totals['episodes_created'] += results.get('episodes_created', 0)
+    
+    async def _set_section_status(self, section_id: int, status: str, conn: Optional[asyncpg.Connection] = None, **kwargs):
+        """Queue a section status transition, writing the buffer every status_flush_size sections."""
+        if self.section_recovery.queue_section_status(section_id, status, **kwargs) >= self.status_flush_size:
+            await self._flush_section_statuses(conn)
+    
+    async def _flush_section_statuses(self, conn: Optional[asyncpg.Connection] = None):
+        """Write buffered section statuses; a failed flush must not abort ingestion."""
+        try:
+            await self.section_recovery.flush_section_statuses(conn)
+        except Exception as e:
+            logger.warning(f"Failed to flush section statuses: {e}")
+    
+    def _estimate_tokens(self, chunk: DocumentChunk) -> int:
+        """Token count of a chunk, estimated from its length when the chunker did not set it."""
+        return chunk.token_count or len(chunk.content) // 4
     
     async def _create_section_chunks(self, section: DocumentSection) -> List[DocumentChunk]:
         """Create chunks from document section."""
         
+        # Sections are already structural units (paragraph, heading, table, sentence split):
+        # one that fits in a chunk becomes that chunk without another pass through the chunker
+        if len(section.content) <= self.chunker.config.chunk_size:
+            return [DocumentChunk(
+                content=section.content,
+                index=0,
+                start_char=0,
+                end_char=len(section.content),
+                metadata={
+                    "title": f"Section_{section.position}",
+                    "source": section.metadata.get('file_path', 'unknown'),
+                    **section.metadata,
+                    "chunk_method": "section"
+                }
+            )]
+        
         try:
             # Use chunker to create chunks from section
             chunks = await self.chunker.chunk_document(
@@ -173,16 +292,37 @@ class OptimizedIngestionPipeline:
         """Process batch of chunks."""
         
         try:
-            # Generate embeddings
+            # Generate embeddings with one API call per embedder batch
             embeddings_created = 0
-            for chunk in chunks:
+            errors = []
+            batch_size = self.embedder.batch_size
+            for i in range(0, len(chunks), batch_size):
+                batch_chunks = chunks[i:i + batch_size]
                 try:
-                    # Generate embedding for chunk
-                    embedding = await self.embedder.generate_embedding(chunk.content)
-                    chunk.embedding = embedding
-                    embeddings_created += 1
+                    embeddings = np.asarray(await self.embedder.generate_embeddings_batch(
+                        [chunk.content for chunk in batch_chunks]
+                    ))
                 except Exception as e:
-                    logger.warning(f"Failed to generate embedding for chunk: {e}")
+                    errors.append(f"Embedding failed for chunks {i}-{i + len(batch_chunks) - 1}: {e}")
+                    continue
+                
+                # The embedder's per-text fallback leaves zero vectors for texts it could not embed
+                missing = int((~embeddings.any(axis=1)).sum())
+                if missing:
+                    errors.append(f"Embedding failed for {missing} of chunks {i}-{i + len(batch_chunks) - 1}")
+                for chunk, embedding in zip(batch_chunks, embeddings):
+                    chunk.embedding = embedding
+                embeddings_created += len(embeddings) - missing
+            
+            if errors:
+                # Chunks without embeddings must not be reported as done: the caller marks the sections failed
+                logger.warning(f"Failed to generate embeddings for {batch_name}: {'; '.join(errors)}")
+                return {
+                    'chunks_created': 0,
+                    'embeddings_created': embeddings_created,
+                    'episodes_created': 0,
+                    'errors': errors
+                }
             
             # Add to knowledge graph (if enabled)
             episodes_created = 0
@@ -5,27 +5,50 @@ Consente re-ingestione solo delle sezioni problematiche.
 
 import logging
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Mapping
 from datetime import datetime, timezone
 from dataclasses import dataclass
 
 import asyncpg
+import orjson
 from dotenv import load_dotenv
 
 # Import database utilities
 try:
-    from ..agent.db_utils import db_pool
+    from ..agent.db_utils import db_pool, acquire_connection
 except ImportError:
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from agent.db_utils import db_pool
+    from agent.db_utils import db_pool, acquire_connection
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Section metadata may carry numpy values and non-string keys
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
 
-@dataclass
+# Colonne nell'ordine dei campi di SectionStatus
+_SECTION_STATUS_COLUMNS = """id, document_status_id, section_position, section_type,
+                   section_hash, status, error_message, chunks_created, entities_extracted"""
+
+# Testo SQL costante: asyncpg riusa lo statement preparato (statement cache per connessione)
+_FAILED_SECTIONS_BY_DOCUMENT_SQL = f"""
+    SELECT {_SECTION_STATUS_COLUMNS}
+    FROM document_sections
+    WHERE document_status_id = $1 AND status = 'failed'
+    ORDER BY section_position
+"""
+
+_FAILED_SECTIONS_SQL = f"""
+    SELECT {_SECTION_STATUS_COLUMNS}
+    FROM document_sections
+    WHERE status = 'failed'
+    ORDER BY document_status_id, section_position
+"""
+
+
+@dataclass(slots=True, frozen=True)
 class SectionStatus:
     """Status di una sezione documento."""
     id: int
@@ -45,6 +68,8 @@ class SectionRecoveryManager:
     def __init__(self):
         """Initialize section recovery manager."""
         self._initialized = False
+        # Status transitions waiting for flush_section_statuses(), keyed by section id
+        self._pending_updates: Dict[int, Dict[str, Any]] = {}
     
     async def initialize(self):
         """Initialize database connections."""
@@ -56,7 +81,8 @@ class SectionRecoveryManager:
                           section_position: int,
                           section_type: str,
                           content: str,
-                          metadata: Optional[Dict] = None) -> int:
+                          metadata: Optional[Dict] = None,
+                          conn: Optional[asyncpg.Connection] = None) -> int:
         """
         Track una nuova sezione per elaborazione.
         
@@ -66,6 +92,7 @@ class SectionRecoveryManager:
             section_type: Tipo sezione (paragraph, table, etc.)
             content: Contenuto sezione
             metadata: Metadati opzionali
+            conn: Connessione da riusare (altrimenti presa dal pool)
             
         Returns:
             ID della sezione creata
@@ -76,7 +103,7 @@ class SectionRecoveryManager:
         section_hash = self._calculate_section_hash(content)
         content_preview = content[:200] if content else ""
         
-        async with db_pool.acquire() as conn:
+        async with acquire_connection(conn) as conn:
             section_id = await conn.fetchval("""
                 INSERT INTO document_sections (
                     document_status_id, section_position, section_type, section_hash,
@@ -97,13 +124,74 @@ class SectionRecoveryManager:
         logger.debug(f"Tracked section {section_position} for document {document_status_id}")
         return section_id
     
+    async def track_sections_bulk(self,
+                                  document_status_id: int,
+                                  sections: List[Tuple[int, str, str, Optional[Mapping[str, Any]]]],
+                                  conn: Optional[asyncpg.Connection] = None) -> List[int]:
+        """
+        Track più sezioni con un singolo INSERT multi-riga (stessa semantica di track_section).
+        
+        Args:
+            document_status_id: ID del documento parent
+            sections: Tuple (section_position, section_type, content, metadata)
+            conn: Connessione da riusare (altrimenti presa dal pool)
+        
+        Returns:
+            ID delle sezioni, nello stesso ordine di sections
+        """
+        if not sections:
+            return []
+        
+        if not self._initialized:
+            await self.initialize()
+        
+        # Una posizione ripetuta aggiorna la stessa riga: come per upsert sequenziali vince l'ultima
+        by_position = {position: (section_type, content, metadata)
+                       for position, section_type, content, metadata in sections}
+        positions = list(by_position)
+        values = [by_position[position] for position in positions]
+        
+        async with acquire_connection(conn) as conn:
+            rows = await conn.fetch("""
+                INSERT INTO document_sections (
+                    document_status_id, section_position, section_type, section_hash,
+                    content_length, content_preview, status, metadata
+                )
+                SELECT $1, v.section_position, v.section_type, v.section_hash,
+                       v.content_length, v.content_preview, 'pending', v.metadata
+                FROM unnest($2::int[], $3::text[], $4::text[], $5::int[], $6::text[], $7::jsonb[])
+                    AS v(section_position, section_type, section_hash,
+                         content_length, content_preview, metadata)
+                ON CONFLICT (document_status_id, section_position)
+                DO UPDATE SET
+                    section_type = EXCLUDED.section_type,
+                    section_hash = EXCLUDED.section_hash,
+                    content_length = EXCLUDED.content_length,
+                    content_preview = EXCLUDED.content_preview,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = NOW()
+                RETURNING id, section_position
+            """,
+                document_status_id,
+                positions,
+                [section_type for section_type, _, _ in values],
+                [self._calculate_section_hash(content) for _, content, _ in values],
+                [len(content) for _, content, _ in values],
+                [content[:200] for _, content, _ in values],
+                [orjson.dumps(dict(metadata), option=_ORJSON_OPTIONS).decode() if metadata is not None else None for _, _, metadata in values])
+        
+        ids_by_position = {row['section_position']: row['id'] for row in rows}
+        logger.debug(f"Tracked {len(rows)} sections for document {document_status_id}")
+        return [ids_by_position[position] for position, _, _, _ in sections]
+    
     async def update_section_status(self,
                                    section_id: int,
                                    status: str,
                                    chunks_created: int = 0,
                                    entities_extracted: int = 0,
                                    graph_episodes_created: int = 0,
-                                   error_message: Optional[str] = None):
+                                   error_message: Optional[str] = None,
+                                   conn: Optional[asyncpg.Connection] = None):
         """
         Aggiorna status di una sezione.
         
@@ -114,13 +202,14 @@ class SectionRecoveryManager:
             entities_extracted: Numero entità estratte
             graph_episodes_created: Episodi knowledge graph
             error_message: Messaggio errore se failed
+            conn: Connessione da riusare (altrimenti presa dal pool)
         """
         if not self._initialized:
             await self.initialize()
         
         now = datetime.now(timezone.utc)
         
-        async with db_pool.acquire() as conn:
+        async with acquire_connection(conn) as conn:
             if status == 'processing':
                 await conn.execute("""
                     UPDATE document_sections 
@@ -144,6 +233,145 @@ class SectionRecoveryManager:
         
         logger.debug(f"Updated section {section_id} status to {status}")
     
+    def queue_section_status(self,
+                             section_id: int,
+                             status: str,
+                             chunks_created: int = 0,
+                             entities_extracted: int = 0,
+                             graph_episodes_created: int = 0,
+                             error_message: Optional[str] = None) -> int:
+        """
+        Bufferizza un aggiornamento di status (stessa semantica di update_section_status).
+        
+        Più transizioni della stessa sezione vengono fuse: resta l'ultimo status,
+        con i timestamp di inizio/fine registrati al momento della transizione.
+        
+        Returns:
+            Numero di sezioni con aggiornamenti in attesa di flush
+        """
+        now = datetime.now(timezone.utc)
+        update = {
+            'status': status,
+            'updated_at': now,
+            'started_at': None,
+            'chunks_created': None,
+            'entities_extracted': None,
+            'graph_episodes_created': None,
+            'error_message': None,
+            'completed_at': None
+        }
+        
+        if status == 'processing':
+            update['started_at'] = now
+        elif status in ['completed', 'failed']:
+            update.update(
+                chunks_created=chunks_created,
+                entities_extracted=entities_extracted,
+                graph_episodes_created=graph_episodes_created,
+                error_message=error_message,
+                completed_at=now
+            )
+        
+        self._merge_pending_update(section_id, update)
+        return len(self._pending_updates)
+    
+    def _merge_pending_update(self, section_id: int, update: Dict[str, Any]):
+        """Fonde `update` nel buffer, sopra eventuali transizioni precedenti della stessa sezione."""
+        pending = self._pending_updates.get(section_id)
+        if pending is None:
+            self._pending_updates[section_id] = update
+            return
+        
+        pending['status'] = update['status']
+        pending['updated_at'] = update['updated_at']
+        if update['started_at'] is not None:
+            pending['started_at'] = update['started_at']
+        if update['completed_at'] is not None:
+            for key in ('chunks_created', 'entities_extracted', 'graph_episodes_created', 'error_message', 'completed_at'):
+                pending[key] = update[key]
+    
+    async def flush_section_statuses(self, conn: Optional[asyncpg.Connection] = None) -> int:
+        """
+        Scrive tutti gli aggiornamenti bufferizzati con un singolo UPDATE multi-riga.
+        
+        Args:
+            conn: Connessione da riusare (altrimenti presa dal pool)
+        
+        Se la scrittura fallisce gli aggiornamenti restano nel buffer (fusi con quelli
+        accodati nel frattempo) e vengono riprovati al flush successivo.
+        
+        Returns:
+            Numero di sezioni aggiornate
+        """
+        if not self._pending_updates:
+            return 0
+        
+        if not self._initialized:
+            await self.initialize()
+        
+        pending, self._pending_updates = self._pending_updates, {}
+        ids = list(pending)
+        updates = [pending[section_id] for section_id in ids]
+        
+        try:
+            await self._write_section_statuses(ids, updates, conn)
+        except Exception:
+            # Le transizioni accodate durante il flush sono più recenti: vanno applicate sopra
+            newer, self._pending_updates = self._pending_updates, pending
+            for section_id, update in newer.items():
+                self._merge_pending_update(section_id, update)
+            raise
+        
+        logger.debug(f"Flushed status updates for {len(ids)} sections")
+        return len(ids)
+    
+    async def _write_section_statuses(self, ids: List[int], updates: List[Dict[str, Any]], conn: Optional[asyncpg.Connection] = None):
+        """Applica gli aggiornamenti bufferizzati con un singolo UPDATE multi-riga."""
+        async with acquire_connection(conn) as conn:
+            await conn.execute("""
+                UPDATE document_sections AS ds
+                SET status = v.status,
+                    processing_started_at = COALESCE(v.started_at, ds.processing_started_at),
+                    chunks_created = COALESCE(v.chunks_created, ds.chunks_created),
+                    entities_extracted = COALESCE(v.entities_extracted, ds.entities_extracted),
+                    graph_episodes_created = COALESCE(v.graph_episodes_created, ds.graph_episodes_created),
+                    error_message = CASE WHEN v.completed_at IS NULL THEN ds.error_message ELSE v.error_message END,
+                    processing_completed_at = COALESCE(v.completed_at, ds.processing_completed_at),
+                    updated_at = v.updated_at
+                FROM unnest($1::int[], $2::text[], $3::timestamptz[], $4::int[], $5::int[],
+                            $6::int[], $7::text[], $8::timestamptz[], $9::timestamptz[])
+                    AS v(id, status, started_at, chunks_created, entities_extracted,
+                         graph_episodes_created, error_message, completed_at, updated_at)
+                WHERE ds.id = v.id
+            """,
+                ids,
+                [u['status'] for u in updates],
+                [u['started_at'] for u in updates],
+                [u['chunks_created'] for u in updates],
+                [u['entities_extracted'] for u in updates],
+                [u['graph_episodes_created'] for u in updates],
+                [u['error_message'] for u in updates],
+                [u['completed_at'] for u in updates],
+                [u['updated_at'] for u in updates])
+    
+    async def update_section_status_batch(self,
+                                          updates: List[Dict[str, Any]],
+                                          conn: Optional[asyncpg.Connection] = None) -> int:
+        """
+        Aggiorna lo status di più sezioni con un solo UPDATE.
+        
+        Args:
+            updates: Argomenti di update_section_status per ogni sezione
+                     (section_id, status, chunks_created, ...)
+            conn: Connessione da riusare (altrimenti presa dal pool)
+        
+        Returns:
+            Numero di sezioni aggiornate
+        """
+        for update in updates:
+            self.queue_section_status(**update)
+        return await self.flush_section_statuses(conn)
+    
     async def get_failed_sections(self, document_status_id: Optional[int] = None) -> List[SectionStatus]:
         """
         Recupera sezioni fallite per recovery.
@@ -159,36 +387,11 @@ class SectionRecoveryManager:
         
         async with db_pool.acquire() as conn:
             if document_status_id:
-                rows = await conn.fetch("""
-                    SELECT id, document_status_id, section_position, section_type, 
-                           section_hash, status, error_message, chunks_created, entities_extracted
-                    FROM document_sections
-                    WHERE document_status_id = $1 AND status = 'failed'
-                    ORDER BY section_position
-                """, document_status_id)
+                rows = await conn.fetch(_FAILED_SECTIONS_BY_DOCUMENT_SQL, document_status_id)
             else:
-                rows = await conn.fetch("""
-                    SELECT id, document_status_id, section_position, section_type,
-                           section_hash, status, error_message, chunks_created, entities_extracted
-                    FROM document_sections
-                    WHERE status = 'failed'
-                    ORDER BY document_status_id, section_position
-                """)
-        
-        return [
-            SectionStatus(
-                id=row['id'],
-                document_status_id=row['document_status_id'],
-                section_position=row['section_position'],
-                section_type=row['section_type'],
-                section_hash=row['section_hash'],
-                status=row['status'],
-                error_message=row['error_message'],
-                chunks_created=row['chunks_created'],
-                entities_extracted=row['entities_extracted']
-            )
-            for row in rows
-        ]
+                rows = await conn.fetch(_FAILED_SECTIONS_SQL)
+        
+        return [SectionStatus(*row) for row in rows]
     
     async def cleanup_failed_sections(self, document_status_id: int) -> int:
         """
@@ -222,47 +425,41 @@ class SectionRecoveryManager:
             await self.initialize()
         
         async with db_pool.acquire() as conn:
-            # Statistiche generali
-            stats = await conn.fetchrow("""
-                SELECT 
-                    COUNT(*) as total_sections,
-                    COUNT(*) FILTER (WHERE status = 'completed') as completed,
-                    COUNT(*) FILTER (WHERE status = 'failed') as failed,
-                    COUNT(*) FILTER (WHERE status = 'processing') as processing,
-                    COUNT(*) FILTER (WHERE status = 'pending') as pending
-                FROM document_sections
-            """)
-            
-            # Documenti con sezioni fallite
-            failed_docs = await conn.fetch("""
-                SELECT 
-                    dis.file_path,
-                    dis.category,
-                    COUNT(*) as failed_sections,
-                    STRING_AGG(ds.section_position::text, ', ' ORDER BY ds.section_position) as positions
-                FROM document_sections ds
-                JOIN document_ingestion_status dis ON ds.document_status_id = dis.id
-                WHERE ds.status = 'failed'
-                GROUP BY dis.file_path, dis.category
-                ORDER BY failed_sections DESC
+            # Statistiche generali e documenti con sezioni fallite in un solo round trip
+            report = await conn.fetchval("""
+                SELECT json_build_object(
+                    'overall', (
+                        SELECT row_to_json(stats) FROM (
+                            SELECT 
+                                COUNT(*) as total_sections,
+                                COUNT(*) FILTER (WHERE status = 'completed') as completed,
+                                COUNT(*) FILTER (WHERE status = 'failed') as failed,
+                                COUNT(*) FILTER (WHERE status = 'processing') as processing,
+                                COUNT(*) FILTER (WHERE status = 'pending') as pending
+                            FROM document_sections
+                        ) stats
+                    ),
+                    'failed_documents', COALESCE((
+                        SELECT json_agg(failed_docs ORDER BY failed_docs.failed_sections DESC) FROM (
+                            SELECT 
+                                dis.file_path,
+                                dis.category,
+                                COUNT(*) as failed_sections,
+                                array_agg(ds.section_position ORDER BY ds.section_position) as section_positions
+                            FROM document_sections ds
+                            JOIN document_ingestion_status dis ON ds.document_status_id = dis.id
+                            WHERE ds.status = 'failed'
+                            GROUP BY dis.file_path, dis.category
+                        ) failed_docs
+                    ), '[]'::json)
+                )
             """)
         
-        return {
-            'overall': dict(stats) if stats else {},
-            'failed_documents': [
-                {
-                    'file_path': row['file_path'],
-                    'category': row['category'],
-                    'failed_sections': row['failed_sections'],
-                    'section_positions': row['positions']
-                }
-                for row in failed_docs
-            ]
-        }
+        return orjson.loads(report)
     
     def _calculate_section_hash(self, content: str) -> str:
-        """Calculate hash for section content."""
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        """Calculate hash for section content (SHA-256: hardware accelerated, fits section_hash VARCHAR(64))."""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
 
 def create_section_recovery_manager() -> SectionRecoveryManager:
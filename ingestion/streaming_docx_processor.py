@@ -5,26 +5,68 @@ Elaborazione paragrafo per paragrafo per ottimizzare memoria e timeout.
 
 import os
 import logging
-from typing import List, Dict, Any, Optional, Iterator, Tuple
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Mapping, FrozenSet
 from pathlib import Path
+from collections import ChainMap
+from types import MappingProxyType
 import re
 import time
+import zipfile
+import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 
-from docx import Document
-from docx.text.paragraph import Paragraph
-from docx.table import Table
-
 logger = logging.getLogger(__name__)
 
+# WordprocessingML (word/document.xml, word/styles.xml)
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = f'{W}body'
+W_P = f'{W}p'
+W_PPR = f'{W}pPr'
+W_PSTYLE = f'{W}pStyle'
+W_PARAGRAPH_STYLE_PATH = f'{W_PPR}/{W_PSTYLE}'
+W_R = f'{W}r'
+W_HYPERLINK = f'{W}hyperlink'
+W_T = f'{W}t'
+W_TAB = f'{W}tab'
+W_PTAB = f'{W}ptab'
+W_BR = f'{W}br'
+W_CR = f'{W}cr'
+W_NO_BREAK_HYPHEN = f'{W}noBreakHyphen'
+W_TYPE = f'{W}type'
+W_TBL = f'{W}tbl'
+W_TR = f'{W}tr'
+W_TC = f'{W}tc'
+W_STYLE = f'{W}style'
+W_STYLE_ID = f'{W}styleId'
+W_NAME = f'{W}name'
+W_VAL = f'{W}val'
+
+# Pattern di compressione/split compilati una volta sola (usati per ogni sezione)
+# Only whitespace that actually changes: runs, and single tabs/newlines/nbsp (a lone space stays)
+WHITESPACE_PATTERN = re.compile(r'\s{2,}|[^\S ]')
+ELLIPSIS_PATTERN = re.compile(r'[.]{3,}')
+DASHES_PATTERN = re.compile(r'[-]{3,}')
+EMPTY_PARENS_PATTERN = re.compile(r'\(\s*\)')
+EMPTY_BRACKETS_PATTERN = re.compile(r'\[\s*\]')
+SENTENCE_END_PATTERN = re.compile(r'[.!?]+\s+')
+
+# Compress medical abbreviations (preserve meaning): one alternation, one pass over the content
+MEDICAL_ABBREVIATION_PATTERN = re.compile(r'\b(Art(?:ic(?:ol)?)?|Musc(?:ol)?|Lig(?:am)?|Tend(?:in)?)\b', re.IGNORECASE)
+MEDICAL_EXPANSIONS = {
+    'art': 'Articolazione',
+    'mus': 'Muscolo',
+    'lig': 'Legamento',
+    'ten': 'Tendine'
+}
 
-@dataclass
+
+@dataclass(slots=True)
 class DocumentSection:
     """Sezione di documento per elaborazione streaming."""
     content: str
     section_type: str  # paragraph, table, heading
     position: int
-    metadata: Dict[str, Any]
+    metadata: Mapping[str, Any]  # chiavi di sezione sopra i metadati file condivisi (ChainMap)
 
 
 class StreamingDOCXProcessor:
@@ -62,42 +104,45 @@ class StreamingDOCXProcessor:
         logger.info(f"🔄 Streaming processing DOCX: {file_path}")
         
         try:
-            doc = Document(file_path)
-            file_metadata = self._extract_file_metadata(doc, file_path)
-            
-            position = 0
-            section_count = 0
-            
-            # Process document elements one by one
-            for element in doc.element.body:
-                start_time = time.time()
+            with zipfile.ZipFile(file_path) as docx_zip:
+                heading_styles = self._read_heading_styles(docx_zip)
+                # Shared read-only by every section instead of being copied into each one
+                file_metadata = MappingProxyType(self._extract_file_metadata(file_path))
                 
-                try:
-                    section = self._process_element(element, position, file_metadata)
-                    
-                    if section and section.content.strip():
-                        # Apply compression if enabled
-                        if self.compression_enabled:
-                            section.content = self._compress_content(section.content)
-                        
-                        # Skip if still too large after compression
-                        if len(section.content) > self.max_section_size:
-                            logger.warning(f"Section {position} too large ({len(section.content)} chars), splitting...")
-                            yield from self._split_large_section(section)
-                        else:
-                            yield section
+                position = 0
+                section_count = 0
+                # One monotonic clock read per element: the end of an element is the start of the next
+                last_tick = time.monotonic()
+                
+                # Process document elements one by one, as they are parsed
+                with docx_zip.open('word/document.xml') as document_xml:
+                    for element in self._iter_body_elements(document_xml):
+                        try:
+                            section = self._process_element(element, position, file_metadata, heading_styles)
+                            
+                            if section and section.content.strip():
+                                # Apply compression if enabled
+                                if self.compression_enabled:
+                                    section.content = self._compress_content(section.content)
+                                
+                                # Skip if still too large after compression
+                                if len(section.content) > self.max_section_size:
+                                    logger.warning(f"Section {position} too large ({len(section.content)} chars), splitting...")
+                                    yield from self._split_large_section(section)
+                                else:
+                                    yield section
+                                
+                                section_count += 1
+                                position += len(section.content)
+                            
+                        except Exception as e:
+                            logger.warning(f"Failed to process element at position {position}: {e}")
                         
-                        section_count += 1
-                        position += len(section.content)
-                    
-                    # Check timeout per section
-                    elapsed = time.time() - start_time
-                    if elapsed > self.timeout_per_section:
-                        logger.warning(f"Section processing timeout ({elapsed:.1f}s), continuing...")
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to process element at position {position}: {e}")
-                    continue
+                        # Check timeout per section
+                        now = time.monotonic()
+                        elapsed, last_tick = now - last_tick, now
+                        if elapsed > self.timeout_per_section:
+                            logger.warning(f"Section processing timeout ({elapsed:.1f}s), continuing...")
             
             logger.info(f"✅ Streaming completed: {section_count} sections, {position} total chars")
             
@@ -105,45 +150,65 @@ class StreamingDOCXProcessor:
             logger.error(f"Streaming processing failed for {file_path}: {e}")
             raise
     
-    def _process_element(self, element, position: int, file_metadata: Dict) -> Optional[DocumentSection]:
+    def _iter_body_elements(self, document_xml) -> Iterator[ET.Element]:
+        """
+        Yield the direct children of w:body (paragraphs, tables) as soon as each one is parsed.
+        
+        Elements already yielded are detached from the tree, so memory stays bounded by the
+        current element instead of growing with the whole document.
+        """
+        depth = 0
+        body = None
+        
+        for event, element in ET.iterparse(document_xml, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if element.tag == W_BODY:
+                    body = element
+                continue
+            
+            depth -= 1
+            # w:document (1) > w:body (2) > paragraph/table (3)
+            if depth == 2 and body is not None:
+                yield element
+                body.remove(element)
+    
+    def _process_element(self, element: ET.Element, position: int, file_metadata: Mapping[str, Any], heading_styles: FrozenSet[str]) -> Optional[DocumentSection]:
         """Process single document element."""
         
         # Handle paragraphs
-        if element.tag.endswith('p'):
-            paragraph = Paragraph(element, None)
-            content = paragraph.text.strip()
+        if element.tag == W_P:
+            text = self._paragraph_text(element)
+            content = text.strip()
             
             if content:
-                section_type = "heading" if self._is_heading(paragraph) else "paragraph"
+                section_type = "heading" if self._is_heading(element, text, heading_styles) else "paragraph"
                 
                 return DocumentSection(
                     content=content,
                     section_type=section_type,
                     position=position,
-                    metadata={
-                        **file_metadata,
+                    metadata=ChainMap({
                         "section_type": section_type,
                         "position": position,
                         "length": len(content)
-                    }
+                    }, file_metadata)
                 )
         
         # Handle tables
-        elif element.tag.endswith('tbl'):
-            table = Table(element, None)
-            content = self._extract_table_content(table)
+        elif element.tag == W_TBL:
+            content = self._extract_table_content(element)
             
             if content:
                 return DocumentSection(
                     content=content,
                     section_type="table",
                     position=position,
-                    metadata={
-                        **file_metadata,
+                    metadata=ChainMap({
                         "section_type": "table",
                         "position": position,
                         "length": len(content)
-                    }
+                    }, file_metadata)
                 )
         
         return None
@@ -162,26 +227,26 @@ class StreamingDOCXProcessor:
             return content
         
         # Remove excessive whitespace
-        content = re.sub(r'\s+', ' ', content)
+        content = WHITESPACE_PATTERN.sub(' ', content)
+        
+        # The passes below only run when their literal precondition is present:
+        # a substring check is C-speed, most paragraphs never reach the regex engine
         
         # Remove repeated punctuation
-        content = re.sub(r'[.]{3,}', '...', content)
-        content = re.sub(r'[-]{3,}', '---', content)
+        if '...' in content:
+            content = ELLIPSIS_PATTERN.sub('...', content)
+        if '---' in content:
+            content = DASHES_PATTERN.sub('---', content)
         
         # Remove empty parentheses/brackets
-        content = re.sub(r'\(\s*\)', '', content)
-        content = re.sub(r'\[\s*\]', '', content)
-        
-        # Compress medical abbreviations (preserve meaning)
-        medical_expansions = {
-            r'\b(Art|Artic|Articol)\b': 'Articolazione',
-            r'\b(Musc|Muscol)\b': 'Muscolo', 
-            r'\b(Lig|Ligam)\b': 'Legamento',
-            r'\b(Tend|Tendin)\b': 'Tendine'
-        }
+        if '(' in content:
+            content = EMPTY_PARENS_PATTERN.sub('', content)
+        if '[' in content:
+            content = EMPTY_BRACKETS_PATTERN.sub('', content)
         
-        for pattern, replacement in medical_expansions.items():
-            content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+        content = MEDICAL_ABBREVIATION_PATTERN.sub(
+            lambda match: MEDICAL_EXPANSIONS[match.group(1)[:3].lower()], content
+        )
         
         return content.strip()
     
@@ -191,44 +256,45 @@ class StreamingDOCXProcessor:
         max_size = self.max_section_size
         
         # Try to split on sentences first
-        sentences = re.split(r'[.!?]+\s+', content)
+        sentences = SENTENCE_END_PATTERN.split(content)
+        # Where each sentence starts in the section content (the split drops the separators)
+        sentence_starts = [0, *(match.end() for match in SENTENCE_END_PATTERN.finditer(content))]
         
-        current_chunk = ""
+        # Sentences are buffered in a list and joined once per part (no quadratic concatenation)
+        buffer: List[str] = []
+        buffer_len = 0
+        part_offset = 0
         chunk_count = 0
         
-        for sentence in sentences:
-            if len(current_chunk + sentence) <= max_size:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    yield DocumentSection(
-                        content=current_chunk.strip(),
-                        section_type=f"{section.section_type}_split",
-                        position=section.position + chunk_count * max_size,
-                        metadata={
-                            **section.metadata,
-                            "split_part": chunk_count,
-                            "is_split": True
-                        }
-                    )
-                    chunk_count += 1
-                
-                current_chunk = sentence + ". "
-        
-        # Add final chunk
-        if current_chunk:
-            yield DocumentSection(
-                content=current_chunk.strip(),
+        def make_part() -> DocumentSection:
+            return DocumentSection(
+                content="".join(buffer).strip(),
                 section_type=f"{section.section_type}_split",
-                position=section.position + chunk_count * max_size,
-                metadata={
-                    **section.metadata,
+                # Offset of the part's first sentence in the section: parts are at most max_size long, not exactly
+                position=section.position + part_offset,
+                metadata=ChainMap({
                     "split_part": chunk_count,
                     "is_split": True
-                }
+                }, section.metadata)
             )
+        
+        for sentence, sentence_start in zip(sentences, sentence_starts):
+            if buffer_len + len(sentence) > max_size and buffer:
+                yield make_part()
+                chunk_count += 1
+                part_offset = sentence_start
+                buffer.clear()
+                buffer_len = 0
+            
+            buffer.append(sentence)
+            buffer.append(". ")
+            buffer_len += len(sentence) + 2
+        
+        # Add final chunk
+        if buffer:
+            yield make_part()
     
-    def _extract_file_metadata(self, doc: Document, file_path: str) -> Dict[str, Any]:
+    def _extract_file_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract basic file metadata."""
         file_size = os.path.getsize(file_path)
         
@@ -241,23 +307,72 @@ class StreamingDOCXProcessor:
             "compression_enabled": self.compression_enabled
         }
     
-    def _is_heading(self, paragraph: Paragraph) -> bool:
+    def _read_heading_styles(self, docx_zip: zipfile.ZipFile) -> FrozenSet[str]:
+        """
+        Ids of the heading/title styles of the document (word/styles.xml is small: parsed whole).
+        
+        Style names are checked once per document here, so each paragraph only needs a set lookup.
+        """
+        try:
+            with docx_zip.open('word/styles.xml') as styles_xml:
+                styles = ET.parse(styles_xml).getroot()
+        except KeyError:
+            return frozenset()
+        
+        heading_styles = set()
+        for style in styles.iter(W_STYLE):
+            name = style.find(W_NAME)
+            style_name = name.get(W_VAL, '').lower() if name is not None else ''
+            if 'heading' in style_name or 'title' in style_name:
+                heading_styles.add(style.get(W_STYLE_ID))
+        return frozenset(heading_styles)
+    
+    def _paragraph_text(self, paragraph: ET.Element) -> str:
+        """
+        Text of a w:p element, like python-docx Paragraph.text.
+        
+        Only direct runs and hyperlink runs are read: nested content such as mc:AlternateContent
+        (whose Choice and Fallback repeat the same text) and deleted text is skipped.
+        """
+        parts = []
+        for child in paragraph:
+            if child.tag == W_R:
+                runs = (child,)
+            elif child.tag == W_HYPERLINK:
+                runs = child.iterfind(W_R)
+            else:
+                continue
+            for run in runs:
+                for node in run:
+                    tag = node.tag
+                    if tag == W_T:
+                        parts.append(node.text or '')
+                    elif tag in (W_TAB, W_PTAB):
+                        parts.append('\t')
+                    elif tag == W_BR:
+                        # Page and column breaks carry no text
+                        if node.get(W_TYPE, 'textWrapping') == 'textWrapping':
+                            parts.append('\n')
+                    elif tag == W_CR:
+                        parts.append('\n')
+                    elif tag == W_NO_BREAK_HYPHEN:
+                        parts.append('-')
+        return ''.join(parts)
+    
+    def _is_heading(self, paragraph: ET.Element, text: str, heading_styles: FrozenSet[str]) -> bool:
         """Check if paragraph is a heading."""
-        if hasattr(paragraph.style, 'name'):
-            style_name = paragraph.style.name.lower()
-            return ('heading' in style_name or 
-                   'title' in style_name or
-                   paragraph.text.isupper())
-        return False
+        style = paragraph.find(W_PARAGRAPH_STYLE_PATH)
+        return ((style is not None and style.get(W_VAL) in heading_styles) or
+                text.isupper())
     
-    def _extract_table_content(self, table: Table) -> str:
+    def _extract_table_content(self, table: ET.Element) -> str:
         """Extract content from table."""
         content_parts = []
         
-        for row in table.rows:
+        for row in table.findall(W_TR):
             row_content = []
-            for cell in row.cells:
-                cell_text = cell.text.strip()
+            for cell in row.findall(W_TC):
+                cell_text = "\n".join(self._paragraph_text(p) for p in cell.findall(W_P)).strip()
                 if cell_text:
                     row_content.append(cell_text)
             
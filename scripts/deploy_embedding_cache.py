@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Deploy schema per cache persistente degli embeddings.
+Crea la tabella embedding_cache su database esistenti senza toccare i dati.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+async def deploy_embedding_cache_schema():
+    """Deploy embedding cache schema to database."""
+    
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    schema_file = project_root / 'sql' / 'embedding_cache_schema.sql'
+    
+    if not schema_file.exists():
+        raise FileNotFoundError(f"Schema file not found: {schema_file}")
+    
+    print(f"🔄 Deploying embedding cache schema...")
+    print(f"📁 Schema file: {schema_file}")
+    print(f"🔗 Database: {database_url.split('@')[1] if '@' in database_url else 'localhost'}")
+    
+    try:
+        # Read schema SQL
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            schema_sql = f.read()
+        
+        # Connect and execute
+        conn = await asyncpg.connect(database_url)
+        
+        try:
+            # Execute schema deployment
+            await conn.execute(schema_sql)
+            print("✅ Embedding cache schema deployed successfully")
+            
+            # Verify deployment
+            table_exists = await conn.fetchval("SELECT to_regclass('public.embedding_cache') IS NOT NULL")
+            cached_embeddings = await conn.fetchval("SELECT COUNT(*) FROM embedding_cache")
+            
+            print(f"\n📊 Deployment verification:")
+            print(f"  {'✅' if table_exists else '❌'} Table: embedding_cache")
+            print(f"  📦 Cached embeddings: {cached_embeddings}")
+            
+        finally:
+            await conn.close()
+    
+    except Exception as e:
+        print(f"❌ Schema deployment failed: {str(e)}")
+        raise
+    
+    print(f"\n🎉 Embedding cache deployment completed successfully!")
+
+
+async def main():
+    """Main function."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    
+    try:
+        await deploy_embedding_cache_schema()
+    except KeyboardInterrupt:
+        print("\n⚠️ Deployment interrupted by user")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Deployment failed: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -11,6 +11,9 @@ import statistics
 from typing import List, Dict, Any
 from uuid import uuid4, UUID
 
+import numpy as np
+import orjson
+
 # Add project root to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -74,32 +77,30 @@ class PerformanceTestSuite:
         cache_miss_times = []
         cache_hit_times = []
         
+        # Inputs are built once so model validation is not part of the measured time
+        search_inputs = [(query, VectorSearchInput(query=query, limit=5)) for query in self.test_queries]
+        
         # Test cache miss (first queries)
-        for query in self.test_queries:
-            start_time = time.time()
+        for query, input_data in search_inputs:
+            start_time = time.perf_counter()
             
             # This should be cache miss
-            input_data = VectorSearchInput(query=query, limit=5)
             try:
                 results = await vector_search_tool(input_data, self.test_tenant_id)
-                cache_miss_time = (time.time() - start_time) * 1000
+                cache_miss_time = (time.perf_counter() - start_time) * 1000
                 cache_miss_times.append(cache_miss_time)
                 print(f"  Cache MISS: {query[:30]:<30} - {cache_miss_time:6.1f}ms - {len(results)} results")
             except Exception as e:
                 print(f"  ❌ Query failed: {query[:30]:<30} - {e}")
         
-        # Small delay to ensure cache is set
-        await asyncio.sleep(0.1)
-        
         # Test cache hit (repeat queries)
-        for query in self.test_queries:
-            start_time = time.time()
+        for query, input_data in search_inputs:
+            start_time = time.perf_counter()
             
             # This should be cache hit
-            input_data = VectorSearchInput(query=query, limit=5)
             try:
                 results = await vector_search_tool(input_data, self.test_tenant_id)
-                cache_hit_time = (time.time() - start_time) * 1000
+                cache_hit_time = (time.perf_counter() - start_time) * 1000
                 cache_hit_times.append(cache_hit_time)
                 print(f"  Cache HIT:  {query[:30]:<30} - {cache_hit_time:6.1f}ms - {len(results)} results")
             except Exception as e:
@@ -123,16 +124,15 @@ class PerformanceTestSuite:
         """Test connection pool performance under concurrent load."""
         print("\n🔗 Testing Connection Pool Performance...")
         
-        async def concurrent_query_task(query_id: int):
+        async def concurrent_query_task(query_id: int, input_data: VectorSearchInput):
             """Single concurrent query task."""
-            start_time = time.time()
+            start_time = time.perf_counter()
             try:
-                input_data = VectorSearchInput(query=f"test query {query_id}", limit=3)
                 results = await vector_search_tool(input_data, self.test_tenant_id)
-                duration = (time.time() - start_time) * 1000
+                duration = (time.perf_counter() - start_time) * 1000
                 return {"query_id": query_id, "duration_ms": duration, "results": len(results), "success": True}
             except Exception as e:
-                duration = (time.time() - start_time) * 1000
+                duration = (time.perf_counter() - start_time) * 1000
                 return {"query_id": query_id, "duration_ms": duration, "error": str(e), "success": False}
         
         # Test concurrent queries
@@ -142,34 +142,43 @@ class PerformanceTestSuite:
         for level in concurrent_levels:
             print(f"  Testing {level} concurrent queries...")
             
-            start_time = time.time()
-            tasks = [concurrent_query_task(i) for i in range(level)]
+            inputs = [VectorSearchInput(query=f"test query {i}", limit=3) for i in range(level)]
+            start_time = time.perf_counter()
+            tasks = [concurrent_query_task(i, input_data) for i, input_data in enumerate(inputs)]
             task_results = await asyncio.gather(*tasks)
-            total_time = (time.time() - start_time) * 1000
+            total_time = (time.perf_counter() - start_time) * 1000
             
-            successful_tasks = [r for r in task_results if r.get("success", False)]
-            failed_tasks = [r for r in task_results if not r.get("success", False)]
+            # Single pass over the task results: durations of the successful ones, the rest failed
+            durations = np.array([r["duration_ms"] for r in task_results if r["success"]], dtype=np.float64)
+            successful_count = len(durations)
+            failed_count = level - successful_count
             
-            if successful_tasks:
-                avg_query_time = statistics.mean([r["duration_ms"] for r in successful_tasks])
-                throughput = len(successful_tasks) / (total_time / 1000) # queries per second
+            if successful_count:
+                avg_query_time = float(durations.mean())
+                # One selection pass for both tail percentiles
+                p95_query_time, p99_query_time = (float(p) for p in np.percentile(durations, [95, 99]))
+                max_query_time = float(durations.max())
+                throughput = successful_count / (total_time / 1000) # queries per second
             else:
-                avg_query_time = 0
+                avg_query_time = p95_query_time = p99_query_time = max_query_time = 0
                 throughput = 0
             
             results[f"concurrent_{level}"] = {
                 "total_time_ms": total_time,
-                "successful_queries": len(successful_tasks),
-                "failed_queries": len(failed_tasks),
+                "successful_queries": successful_count,
+                "failed_queries": failed_count,
                 "avg_query_time_ms": avg_query_time,
+                "p95_query_time_ms": p95_query_time,
+                "p99_query_time_ms": p99_query_time,
+                "max_query_time_ms": max_query_time,
                 "throughput_qps": throughput,
-                "success_rate": len(successful_tasks) / level * 100
+                "success_rate": successful_count / level * 100
             }
             
-            print(f"    ✅ {len(successful_tasks)}/{level} success, avg: {avg_query_time:.1f}ms, {throughput:.1f} q/s")
+            print(f"    ✅ {successful_count}/{level} success, avg: {avg_query_time:.1f}ms, p95: {p95_query_time:.1f}ms, {throughput:.1f} q/s")
             
-            if failed_tasks:
-                print(f"    ❌ {len(failed_tasks)} failures")
+            if failed_count:
+                print(f"    ❌ {failed_count} failures")
         
         return results
     
@@ -255,9 +264,8 @@ async def main():
     results = await test_suite.run_all_tests()
     
     # Optional: Save results to file
-    import json
-    with open("performance_test_results.json", "w") as f:
-        json.dump(results, f, indent=2, default=str)
+    with open("performance_test_results.json", "wb") as f:
+        f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
     print(f"\n📁 Results saved to performance_test_results.json")
 
 
@@ -9,7 +9,7 @@ import sys
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, List, Any
-import json
+import orjson
 from datetime import datetime
 
 class NeonSchemaVerifier:
@@ -365,8 +365,8 @@ def main():
     
     # Salva risultati
     output_file = f"neon_verification_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2, default=str)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2))
     
     print(f"\n📄 Risultati salvati in: {output_file}")
     
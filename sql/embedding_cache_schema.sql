@@ -0,0 +1,14 @@
+-- Schema per cache persistente degli embeddings
+-- Migrazione idempotente per database già deployati con schema_with_auth.sql
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Embeddings keyed by blake2b-128(chunk content), shared across documents and re-ingestions
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    hash BYTEA NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (hash, provider, model)
+);
@@ -44,6 +44,7 @@ DROP TABLE IF EXISTS medical_content_quiz CASCADE;
 DROP TABLE IF EXISTS medical_content_quizquestion CASCADE;
 DROP TABLE IF EXISTS medical_content_quizanswer CASCADE;
 DROP TABLE IF EXISTS medical_content_quizcategory CASCADE;
+DROP TABLE IF EXISTS embedding_cache CASCADE;
 DROP TABLE IF EXISTS chunks CASCADE;
 DROP TABLE IF EXISTS documents CASCADE;
 DROP TABLE IF EXISTS document_ingestion_status CASCADE;
@@ -322,6 +323,16 @@ CREATE INDEX idx_chunks_chunk_index ON chunks(document_id, chunk_index);
 CREATE INDEX idx_chunks_content_trgm ON chunks USING GIN (content gin_trgm_ops);
 CREATE INDEX idx_chunks_category_order ON chunks(category, document_order);
 
+-- Embeddings keyed by blake2b-128(chunk content), shared across documents and re-ingestions
+CREATE TABLE embedding_cache (
+    hash BYTEA NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    embedding vector NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (hash, provider, model)
+);
+
 -- =====================================================
 -- RAG ENGINE (Chat & Analytics)
 -- =====================================================
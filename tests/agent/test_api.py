@@ -0,0 +1,73 @@
+"""
+Tests for the API health endpoint.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from agent import api
+
+
+@pytest.fixture
+def backends():
+    """Patch the health probes; each test sets their results."""
+    with patch.object(api, "test_connection", AsyncMock(return_value=True)) as db, \
+         patch.object(api, "test_graph_connection", AsyncMock(return_value=True)) as graph, \
+         patch.object(api, "cache_manager") as cache, \
+         patch.object(api, "update_connection_metrics"), \
+         patch.object(api, "_health_cache", None):
+        cache.health_check = AsyncMock(return_value={"status": "healthy"})
+        yield db, graph, cache
+
+
+class TestHealthCache:
+    """Test caching of /health results."""
+    
+    @pytest.mark.asyncio
+    async def test_healthy_result_is_cached(self, backends):
+        """Test a healthy result is reused within HEALTH_CACHE_TTL."""
+        db, _, _ = backends
+        
+        with patch.object(api, "HEALTH_CACHE_TTL", 60.0):
+            first = await api.health_check()
+            second = await api.health_check()
+        
+        assert first.status == "healthy"
+        assert second is first
+        assert db.await_count == 1
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("db_ok,graph_ok,cache_status,expected", [
+        (True, False, "healthy", "degraded"),
+        (False, False, "unhealthy", "unhealthy"),
+    ])
+    async def test_non_healthy_result_is_never_cached(self, backends, db_ok, graph_ok, cache_status, expected):
+        """Test degraded and unhealthy results are probed again on the next call."""
+        db, graph, cache = backends
+        db.return_value = db_ok
+        graph.return_value = graph_ok
+        cache.health_check.return_value = {"status": cache_status}
+        
+        with patch.object(api, "HEALTH_CACHE_TTL", 60.0):
+            first = await api.health_check()
+            assert first.status == expected
+            assert api._health_cache is None
+            
+            # The backends recover: the next probe must see it
+            db.return_value = graph.return_value = True
+            cache.health_check.return_value = {"status": "healthy"}
+            second = await api.health_check()
+        
+        assert second.status == "healthy"
+        assert db.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_zero_ttl_disables_cache(self, backends):
+        """Test HEALTH_CACHE_TTL=0 probes the backends on every call."""
+        db, _, _ = backends
+        
+        with patch.object(api, "HEALTH_CACHE_TTL", 0.0):
+            await api.health_check()
+            await api.health_check()
+        
+        assert db.await_count == 2
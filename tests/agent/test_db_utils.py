@@ -8,6 +8,8 @@ import json
 from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime, timezone, timedelta
 
+import numpy as np
+
 from agent.db_utils import (
     DatabasePool,
     create_session,
@@ -20,7 +22,9 @@ from agent.db_utils import (
     vector_search,
     hybrid_search,
     get_document_chunks,
-    test_connection as db_test_connection
+    test_connection as db_test_connection,
+    _encode_vector,
+    _decode_vector
 )
 
 
@@ -59,6 +63,45 @@ class TestDatabasePool:
                 command_timeout=60
             )
     
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cpu_count,min_size,max_size", [(1, 1, 10), (64, 25, 25)])
+    async def test_initialize_pool_size_follows_cpu_count(self, cpu_count, min_size, max_size):
+        """Test pool bounds stay valid on small and large hosts."""
+        pool = DatabasePool("postgresql://test")
+        
+        with patch('os.cpu_count', return_value=cpu_count), \
+             patch('asyncpg.create_pool', new_callable=AsyncMock) as mock_create_pool:
+            await pool.initialize()
+            
+            kwargs = mock_create_pool.call_args.kwargs
+            assert kwargs["min_size"] == min_size
+            assert kwargs["max_size"] == max_size
+            assert kwargs["min_size"] <= kwargs["max_size"]
+    
+    @pytest.mark.asyncio
+    async def test_init_connection_registers_vector_codec_in_its_schema(self):
+        """Test the vector codec is registered in the schema pgvector is installed in."""
+        pool = DatabasePool("postgresql://test")
+        mock_conn = AsyncMock()
+        mock_conn.fetchval.return_value = "extensions"
+        
+        await pool._init_connection(mock_conn)
+        
+        mock_conn.set_type_codec.assert_called_once()
+        assert mock_conn.set_type_codec.call_args.kwargs["schema"] == "extensions"
+        assert mock_conn.set_type_codec.call_args.kwargs["format"] == "binary"
+    
+    @pytest.mark.asyncio
+    async def test_init_connection_without_pgvector_raises(self):
+        """Test a database without the vector type is rejected."""
+        pool = DatabasePool("postgresql://test")
+        mock_conn = AsyncMock()
+        mock_conn.fetchval.return_value = None
+        
+        with pytest.raises(RuntimeError, match="pgvector"):
+            await pool._init_connection(mock_conn)
+        mock_conn.set_type_codec.assert_not_called()
+    
     @pytest.mark.asyncio
     async def test_close(self):
         """Test pool closure."""
@@ -203,6 +246,26 @@ class TestMessageManagement:
             assert call_args[0][2] == "user"  # role
             assert call_args[0][3] == "Hello"  # content
     
+    @pytest.mark.asyncio
+    async def test_add_message_metadata_with_numpy_and_int_keys(self):
+        """Test metadata holding numpy scalars and non-string keys is serialized."""
+        with patch('agent.db_utils.db_pool') as mock_pool:
+            mock_conn = AsyncMock()
+            mock_conn.fetchrow.return_value = {"id": "message-123"}
+            mock_pool.acquire.return_value.__aenter__ = AsyncMock(return_value=mock_conn)
+            mock_pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+            
+            await add_message(
+                session_id="session-123",
+                tenant_id="tenant-123",
+                role="assistant",
+                content="Hello",
+                metadata={"score": np.float32(0.5), 3: "chunk"}
+            )
+            
+            metadata = mock_conn.fetchrow.call_args[0][5]
+            assert json.loads(metadata) == {"score": 0.5, "3": "chunk"}
+    
     @pytest.mark.asyncio
     async def test_get_session_messages(self):
         """Test getting session messages."""
@@ -402,6 +465,23 @@ class TestVectorSearch:
             assert chunks[1]["chunk_index"] == 1
 
 
+class TestVectorCodec:
+    """Test pgvector binary codec."""
+    
+    def test_encode_layout(self):
+        """Test encoded value matches pgvector binary layout."""
+        data = _encode_vector([1.0, -2.5])
+        
+        assert data[:4] == b"\x00\x02\x00\x00"  # dimensions=2, unused=0
+        assert len(data) == 4 + 2 * 4
+    
+    def test_round_trip(self):
+        """Test encode/decode round trip."""
+        embedding = [0.5, -0.25, 1.0, 0.0]
+        
+        assert _decode_vector(_encode_vector(embedding)) == embedding
+
+
 class TestUtilityFunctions:
     """Test utility functions."""
     
@@ -0,0 +1,163 @@
+"""
+Tests for incremental ingestion status management.
+"""
+
+import pytest
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from uuid import uuid4
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from ingestion.incremental_manager import IncrementalIngestionManager, DocumentScanResult, IngestionAction
+
+
+def make_conn() -> MagicMock:
+    """Connection mock whose transaction() works as an async context manager."""
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[])
+    conn.fetchval = AsyncMock(return_value=0)
+    conn.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    conn.transaction = transaction
+    return conn
+
+
+def make_scan_result(file_path: str, category: str = "ginocchio", document_order: int = 1, file_hash: str = "h") -> DocumentScanResult:
+    return DocumentScanResult(
+        file_path=file_path,
+        category=category,
+        document_order=document_order,
+        current_hash=file_hash,
+        file_size=100,
+        last_modified=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        action=IngestionAction.INGEST,
+        reason="new"
+    )
+
+
+@contextmanager
+def patched_pool(conn):
+    """Route db_pool.acquire() to `conn`."""
+    with patch('ingestion.incremental_manager.db_pool') as mock_pool:
+        @asynccontextmanager
+        async def acquire():
+            yield conn
+
+        mock_pool.acquire = acquire
+        yield
+
+
+class TestCleanupIncompleteIngestion:
+    """Test cleanup of a document before re-ingestion."""
+    
+    async def test_exact_source_and_tenant(self):
+        """Test cleanup with a source only matches that source within the tenant."""
+        manager = IncrementalIngestionManager()
+        conn = make_conn()
+        conn.fetch.return_value = [{'id': 1}]
+        tenant_id = uuid4()
+        
+        await manager.cleanup_incomplete_ingestion("documents/a/notes.md", conn=conn, source="a/notes.md", tenant_id=tenant_id)
+        
+        select_sql, *select_args = conn.fetch.call_args[0]
+        assert "LIKE" not in select_sql
+        assert "source = $1" in select_sql and "tenant_id = $2" in select_sql
+        assert select_args == ["a/notes.md", tenant_id]
+        
+        update_sql, *update_args = conn.execute.call_args[0]
+        assert "file_path = $1 AND tenant_id = $2" in update_sql
+        assert update_args == ["documents/a/notes.md", tenant_id]
+    
+    async def test_legacy_file_name_match(self):
+        """Test cleanup without a source keeps the file name match."""
+        manager = IncrementalIngestionManager()
+        conn = make_conn()
+        
+        await manager.cleanup_incomplete_ingestion("documents/a/notes.md", conn=conn)
+        
+        select_sql, *select_args = conn.fetch.call_args[0]
+        assert "LIKE" in select_sql
+        assert select_args == ["documents/a/notes.md", "%notes.md"]
+        # No documents found: only the status reset runs
+        conn.fetchval.assert_not_called()
+        assert conn.execute.call_args[0][1:] == ("documents/a/notes.md",)
+
+
+class TestIngestionReport:
+    """Test the single-query ingestion report."""
+    
+    async def test_report_shape_and_types(self):
+        """Test counts stay ints and problem document timestamps are datetimes."""
+        manager = IncrementalIngestionManager()
+        conn = make_conn()
+        conn.fetchval.return_value = (
+            '{"overall": {"total_documents": 3, "completed": 1, "partial": 0, "failed": 1, "processing": 1, "pending": 0},'
+            ' "by_category": [{"category": "ginocchio", "total": 3, "completed": 1, "incomplete": 2}],'
+            ' "problem_documents": [{"file_path": "documents/ginocchio/01_a.docx", "status": "failed",'
+            ' "category": "ginocchio", "document_order": 1, "updated_at": "2025-01-02T03:04:05.123456+00:00"}]}'
+        )
+        
+        with patched_pool(conn):
+            report = await manager.get_ingestion_report()
+        
+        assert report['overall']['total_documents'] == 3
+        assert report['by_category'][0]['incomplete'] == 2
+        updated_at = report['problem_documents'][0]['updated_at']
+        assert updated_at == datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+
+
+class TestBulkCreateOrUpdateStatus:
+    """Test the single-statement status upsert for scanned documents."""
+    
+    async def test_parameter_arrays(self):
+        """Test each column is passed as one array, aligned with the input order."""
+        manager = IncrementalIngestionManager()
+        conn = make_conn()
+        conn.fetch.return_value = [{'id': 7, 'file_path': "a.docx"}, {'id': 8, 'file_path': "b.docx"}]
+        tenant_id = uuid4()
+        documents = [make_scan_result("a.docx", "ginocchio", 1, "ha"), make_scan_result("b.docx", "colonna", 2, "hb")]
+        
+        with patched_pool(conn):
+            ids = await manager.bulk_create_or_update_status(documents, tenant_id)
+        
+        assert ids == {"a.docx": 7, "b.docx": 8}
+        conn.fetch.assert_awaited_once()
+        _, paths, hashes, sizes, modified, categories, orders, priorities, status, tenant = conn.fetch.call_args[0]
+        assert paths == ["a.docx", "b.docx"]
+        assert hashes == ["ha", "hb"]
+        assert sizes == [100, 100]
+        assert modified == [datetime(2025, 1, 1, tzinfo=timezone.utc)] * 2
+        assert categories == ["ginocchio", "colonna"]
+        assert orders == [1, 2]
+        assert priorities == [manager.calculate_citation_priority("ginocchio", 1), manager.calculate_citation_priority("colonna", 2)]
+        assert (status, tenant) == ('pending', tenant_id)
+    
+    async def test_duplicate_file_paths(self):
+        """Test a file listed twice is upserted once, with its last scan result."""
+        manager = IncrementalIngestionManager()
+        conn = make_conn()
+        documents = [
+            make_scan_result("a.docx", file_hash="old"),
+            make_scan_result("b.docx"),
+            make_scan_result("a.docx", file_hash="new")
+        ]
+        
+        with patched_pool(conn):
+            await manager.bulk_create_or_update_status(documents, uuid4())
+        
+        paths, hashes = conn.fetch.call_args[0][1:3]
+        assert paths == ["a.docx", "b.docx"]
+        assert hashes == ["new", "h"]
+    
+    async def test_empty_input_skips_database(self):
+        """Test no query runs when there is nothing to upsert."""
+        conn = make_conn()
+        
+        with patched_pool(conn):
+            assert await IncrementalIngestionManager().bulk_create_or_update_status([], uuid4()) == {}
+        
+        conn.fetch.assert_not_called()
@@ -0,0 +1,109 @@
+"""
+Tests for the document ingestion pipeline.
+"""
+
+import pytest
+import numpy as np
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+from agent.models import IngestionConfig
+from ingestion.chunker import DocumentChunk
+from ingestion.ingest import DocumentIngestionPipeline
+
+
+def make_chunk(content: str, index: int) -> DocumentChunk:
+    return DocumentChunk(content=content, index=index, start_char=0, end_char=len(content), metadata={"position": index})
+
+
+@pytest.fixture
+def pipeline():
+    """Pipeline with no backend connections."""
+    return DocumentIngestionPipeline(IngestionConfig(), documents_folder="documents")
+
+
+class TestEmbedWithCache:
+    """Test the persistent embedding cache path."""
+    
+    @pytest.fixture
+    def mock_conn(self):
+        conn = AsyncMock()
+        conn.fetch.return_value = []
+        
+        @asynccontextmanager
+        async def acquire():
+            yield conn
+        
+        with patch('ingestion.ingest.db_pool') as mock_pool, \
+             patch('ingestion.ingest.get_embedding_provider', return_value="openai"):
+            mock_pool.acquire = acquire
+            yield conn
+    
+    async def test_zero_vectors_are_not_cached(self, pipeline, mock_conn):
+        """Test texts the embedder failed on (zero vectors) are not stored in embedding_cache."""
+        chunks = [make_chunk("good", 0), make_chunk("failed", 1)]
+        keys = [pipeline._content_key(chunk.content) for chunk in chunks]
+        
+        async def embed_chunks(batch):
+            # Per-text fallback: the second text could not be embedded and is left as zeros
+            batch[0].embedding = np.ones(3, dtype=np.float32)
+            batch[1].embedding = np.zeros(3, dtype=np.float32)
+            return batch
+        
+        pipeline.embedder.embed_chunks = embed_chunks
+        
+        embedded = await pipeline._embed_with_cache(chunks, keys)
+        
+        assert len(embedded) == 2
+        cached_entries = mock_conn.executemany.call_args[0][1]
+        assert [entry[0] for entry in cached_entries] == [keys[0]]
+    
+    async def test_failed_batch_is_not_cached(self, pipeline, mock_conn):
+        """Test chunks marked with embedding_error are not stored in embedding_cache."""
+        chunks = [make_chunk("text", 0)]
+        keys = [pipeline._content_key("text")]
+        
+        async def embed_chunks(batch):
+            batch[0].metadata["embedding_error"] = "boom"
+            batch[0].embedding = np.zeros(3, dtype=np.float32)
+            return batch
+        
+        pipeline.embedder.embed_chunks = embed_chunks
+        
+        await pipeline._embed_with_cache(chunks, keys)
+        
+        mock_conn.executemany.assert_not_called()
+
+
+class TestDeduplicateChunks:
+    """Test embedding duplicate chunk texts once."""
+    
+    async def test_duplicates_embedded_once(self, pipeline):
+        """Test each distinct text reaches the embedder exactly once."""
+        chunks = [make_chunk("a", 0), make_chunk("b", 1), make_chunk("a", 2), make_chunk("a", 3)]
+        
+        unique_chunks, unique_keys, representative_idx = pipeline._deduplicate_chunks(chunks)
+        
+        assert [chunk.content for chunk in unique_chunks] == ["a", "b"]
+        assert unique_keys == [pipeline._content_key("a"), pipeline._content_key("b")]
+        assert representative_idx == [0, 1, 0, 0]
+    
+    async def test_expand_keeps_order_index_and_metadata(self, pipeline):
+        """Test duplicates get the shared embedding but keep their own index and metadata."""
+        chunks = [make_chunk("a", 0), make_chunk("b", 1), make_chunk("a", 2)]
+        unique_chunks, _, representative_idx = pipeline._deduplicate_chunks(chunks)
+        
+        embedded_unique = []
+        for value, chunk in enumerate(unique_chunks, start=1):
+            chunk.metadata = {**chunk.metadata, "embedding_model": "test"}
+            chunk.embedding = np.full(3, value, dtype=np.float32)
+            embedded_unique.append(chunk)
+        
+        embedded = pipeline._expand_duplicate_chunks(chunks, embedded_unique, representative_idx)
+        
+        assert [chunk.index for chunk in embedded] == [0, 1, 2]
+        assert [chunk.content for chunk in embedded] == ["a", "b", "a"]
+        assert embedded[2] is not embedded[0]
+        assert np.array_equal(embedded[2].embedding, embedded[0].embedding)
+        assert embedded[2].metadata == {"position": 2, "embedding_model": "test"}
+        assert embedded[0].metadata == {"position": 0, "embedding_model": "test"}
@@ -0,0 +1,199 @@
+"""
+Tests for the optimized (streaming) ingestion pipeline.
+"""
+
+import asyncio
+import itertools
+import threading
+from contextlib import aclosing
+
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock
+
+from ingestion.chunker import DocumentChunk
+from ingestion.streaming_docx_processor import DocumentSection
+from ingestion.optimized_pipeline import OptimizedIngestionPipeline
+from ingestion.section_recovery_manager import SectionRecoveryManager
+
+
+class StubEmbedder:
+    """Embedder that fails on texts containing 'bad' and, optionally, on its first call."""
+    
+    def __init__(self, batch_size: int = 2, fail_first_call: bool = False):
+        self.batch_size = batch_size
+        self.fail_first_call = fail_first_call
+        self.calls = []
+    
+    async def generate_embeddings_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.fail_first_call and len(self.calls) == 1:
+            raise RuntimeError("rate limited")
+        if any("bad" in text for text in texts):
+            raise RuntimeError("cannot embed")
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+def make_pipeline(embedder) -> OptimizedIngestionPipeline:
+    graph_builder = Mock(spec=[])  # No add_chunks_to_graph: graph disabled
+    pipeline = OptimizedIngestionPipeline(
+        streaming_processor=Mock(),
+        chunker=Mock(),
+        embedder=embedder,
+        graph_builder=graph_builder
+    )
+    pipeline.section_recovery = Mock()
+    pipeline.section_recovery.track_sections_bulk = AsyncMock(side_effect=lambda doc_id, values, conn=None: [100 + i for i in range(len(values))])
+    pipeline.section_recovery.queue_section_status = Mock(return_value=0)
+    return pipeline
+
+
+def make_sections(contents):
+    sections = []
+    for position, content in enumerate(contents):
+        section = DocumentSection(content=content, section_type="paragraph", position=position, metadata={})
+        chunk = DocumentChunk(content=content, index=0, start_char=0, end_char=len(content), metadata={})
+        sections.append((section, [chunk]))
+    return sections
+
+
+def final_statuses(pipeline):
+    return {call.args[0]: call.args[1] for call in pipeline.section_recovery.queue_section_status.call_args_list
+            if call.args[1] != 'processing'}
+
+
+class TestFlushSections:
+    """Test batched section processing and its per-section fallback."""
+    
+    async def test_successful_batch_completes_all_sections(self):
+        """Test a batch that embeds cleanly marks every section completed."""
+        pipeline = make_pipeline(StubEmbedder())
+        totals = {'chunks_created': 0, 'entities_extracted': 0, 'episodes_created': 0}
+        errors = []
+        
+        await pipeline._flush_sections(1, make_sections(["a", "b", "c"]), "doc_batch_1", totals, errors)
+        
+        assert final_statuses(pipeline) == {100: 'completed', 101: 'completed', 102: 'completed'}
+        assert totals['chunks_created'] == 3
+        assert errors == []
+    
+    async def test_bad_section_fails_alone(self):
+        """Test only the section that cannot be embedded is marked failed."""
+        pipeline = make_pipeline(StubEmbedder())
+        totals = {'chunks_created': 0, 'entities_extracted': 0, 'episodes_created': 0}
+        errors = []
+        
+        await pipeline._flush_sections(1, make_sections(["a", "bad", "c"]), "doc_batch_1", totals, errors)
+        
+        assert final_statuses(pipeline) == {100: 'completed', 101: 'failed', 102: 'completed'}
+        assert totals['chunks_created'] == 2
+        assert errors
+    
+    async def test_transient_failure_is_retried_per_section(self):
+        """Test a batch whose embedding call fails once is recovered by the per-section retry."""
+        embedder = StubEmbedder(fail_first_call=True)
+        pipeline = make_pipeline(embedder)
+        totals = {'chunks_created': 0, 'entities_extracted': 0, 'episodes_created': 0}
+        errors = []
+        
+        await pipeline._flush_sections(1, make_sections(["a", "b", "c"]), "doc_batch_1", totals, errors)
+        
+        assert final_statuses(pipeline) == {100: 'completed', 101: 'completed', 102: 'completed'}
+        assert totals['chunks_created'] == 3
+        # The batch's embedder calls (the first one failed), then one call per section
+        assert embedder.calls == [["a", "b"], ["c"], ["a"], ["b"], ["c"]]
+    
+    async def test_zero_vectors_are_reported_as_errors(self):
+        """Test rows the embedder's fallback left as zero vectors fail the batch."""
+        embedder = StubEmbedder()
+        embedder.generate_embeddings_batch = AsyncMock(return_value=np.array([[1, 1, 1], [0, 0, 0]], dtype=np.float32))
+        pipeline = make_pipeline(embedder)
+        chunks = [section_chunks[0] for _, section_chunks in make_sections(["a", "b"])]
+        
+        result = await pipeline._process_chunks_batch(chunks, "doc_batch_1")
+        
+        assert result['chunks_created'] == 0
+        assert result['embeddings_created'] == 1
+        assert result['errors']
+
+
+class TestSectionStatusFlush:
+    """Test when buffered section statuses are written."""
+    
+    async def test_flush_at_threshold(self):
+        """Test statuses are flushed once status_flush_size sections are buffered."""
+        pipeline = make_pipeline(StubEmbedder())
+        pipeline.status_flush_size = 3
+        buffered = iter([1, 2, 3])
+        pipeline.section_recovery.queue_section_status = Mock(side_effect=lambda *args, **kwargs: next(buffered))
+        pipeline.section_recovery.flush_section_statuses = AsyncMock()
+        
+        await pipeline._set_section_status(1, 'processing')
+        await pipeline._set_section_status(2, 'processing')
+        pipeline.section_recovery.flush_section_statuses.assert_not_awaited()
+        
+        await pipeline._set_section_status(3, 'processing')
+        pipeline.section_recovery.flush_section_statuses.assert_awaited_once()
+    
+    async def test_failed_flush_does_not_abort_ingestion(self):
+        """Test a flush error is logged, not raised, leaving the updates buffered for the next flush."""
+        pipeline = make_pipeline(StubEmbedder())
+        pipeline.section_recovery = SectionRecoveryManager()
+        conn = AsyncMock()
+        conn.execute.side_effect = RuntimeError("connection lost")
+        pipeline.section_recovery.queue_section_status(1, 'completed', chunks_created=1)
+        
+        await pipeline._flush_section_statuses(conn)
+        
+        assert list(pipeline.section_recovery._pending_updates) == [1]
+
+
+class TestPrefetchSections:
+    """Test read-ahead of parsed sections in a worker thread."""
+    
+    async def test_early_stop_closes_parser(self):
+        """Test a consumer that stops early ends the producer and closes the parser."""
+        pulled = []
+        closed = threading.Event()
+        
+        def parse(file_path):
+            try:
+                for position in itertools.count():
+                    pulled.append(position)
+                    yield DocumentSection(content=f"s{position}", section_type="paragraph", position=position, metadata={})
+            finally:
+                closed.set()
+        
+        pipeline = make_pipeline(StubEmbedder())
+        pipeline.section_prefetch = 2
+        pipeline.streaming_processor.process_docx_streaming = parse
+        
+        async with aclosing(pipeline._prefetch_sections("doc.docx")) as sections:
+            async for section in sections:
+                if section.position == 1:
+                    break
+        
+        assert closed.is_set()
+        pulled_at_exit = len(pulled)
+        # Bounded read-ahead: the queue, plus the item being put and the one being parsed
+        assert pulled_at_exit <= 2 + pipeline.section_prefetch + 2
+        await asyncio.sleep(0.05)
+        assert len(pulled) == pulled_at_exit
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+    
+    async def test_parser_error_reaches_consumer(self):
+        """Test an exception raised by the parser is re-raised to the consumer after the sections before it."""
+        def parse(file_path):
+            yield DocumentSection(content="a", section_type="paragraph", position=0, metadata={})
+            raise ValueError("corrupted document.xml")
+        
+        pipeline = make_pipeline(StubEmbedder())
+        pipeline.streaming_processor.process_docx_streaming = parse
+        received = []
+        
+        with pytest.raises(ValueError, match="corrupted"):
+            async with aclosing(pipeline._prefetch_sections("doc.docx")) as sections:
+                async for section in sections:
+                    received.append(section.content)
+        
+        assert received == ["a"]
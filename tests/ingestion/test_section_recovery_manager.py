@@ -0,0 +1,133 @@
+"""
+Tests for section-level recovery tracking.
+"""
+
+import pytest
+import orjson
+from unittest.mock import AsyncMock
+
+from ingestion.section_recovery_manager import SectionRecoveryManager
+
+
+@pytest.fixture
+def manager():
+    return SectionRecoveryManager()
+
+
+class TestTrackSectionsBulk:
+    """Test tracking many sections with one INSERT."""
+    
+    async def test_parameter_arrays(self, manager):
+        """Test each column is passed as one array, aligned with the section positions."""
+        conn = AsyncMock()
+        conn.fetch.return_value = [{'id': 10, 'section_position': 0}, {'id': 11, 'section_position': 1}]
+        sections = [
+            (0, "heading", "Titolo", None),
+            (1, "paragraph", "x" * 250, {"style": "Normal", 1: 2.5})
+        ]
+        
+        ids = await manager.track_sections_bulk(5, sections, conn=conn)
+        
+        assert ids == [10, 11]
+        _, document_status_id, positions, types, hashes, lengths, previews, metadata = conn.fetch.call_args[0]
+        assert document_status_id == 5
+        assert positions == [0, 1]
+        assert types == ["heading", "paragraph"]
+        assert hashes == [manager._calculate_section_hash("Titolo"), manager._calculate_section_hash("x" * 250)]
+        assert lengths == [6, 250]
+        assert previews == ["Titolo", "x" * 200]
+        assert metadata[0] is None
+        assert orjson.loads(metadata[1]) == {"style": "Normal", "1": 2.5}
+    
+    async def test_ids_follow_input_order(self, manager):
+        """Test ids are returned in input order whatever order RETURNING yields rows in."""
+        conn = AsyncMock()
+        conn.fetch.return_value = [{'id': 22, 'section_position': 7}, {'id': 20, 'section_position': 3}, {'id': 21, 'section_position': 5}]
+        sections = [(5, "paragraph", "b", None), (3, "paragraph", "a", None), (7, "paragraph", "c", None)]
+        
+        assert await manager.track_sections_bulk(1, sections, conn=conn) == [21, 20, 22]
+    
+    async def test_duplicate_positions(self, manager):
+        """Test a repeated position is inserted once, with its last values, and its id is returned for every occurrence."""
+        conn = AsyncMock()
+        conn.fetch.return_value = [{'id': 30, 'section_position': 0}, {'id': 31, 'section_position': 1}]
+        sections = [(0, "paragraph", "old", None), (1, "table", "t", None), (0, "heading", "new", None)]
+        
+        ids = await manager.track_sections_bulk(1, sections, conn=conn)
+        
+        assert ids == [30, 31, 30]
+        positions, types, hashes = conn.fetch.call_args[0][2:5]
+        assert positions == [0, 1]
+        assert types == ["heading", "table"]
+        assert hashes[0] == manager._calculate_section_hash("new")
+    
+    async def test_empty_input_skips_database(self, manager):
+        """Test no query runs when there are no sections."""
+        conn = AsyncMock()
+        
+        assert await manager.track_sections_bulk(1, [], conn=conn) == []
+        conn.fetch.assert_not_called()
+
+
+class TestSectionStatusBuffer:
+    """Test buffered section status updates."""
+    
+    def test_queue_merges_transitions(self, manager):
+        """Test the buffer holds one entry per section with its latest status."""
+        assert manager.queue_section_status(1, 'processing') == 1
+        assert manager.queue_section_status(2, 'processing') == 2
+        assert manager.queue_section_status(1, 'completed', chunks_created=3) == 2
+        
+        update = manager._pending_updates[1]
+        assert update['status'] == 'completed'
+        assert update['started_at'] is not None
+        assert update['chunks_created'] == 3
+        assert update['completed_at'] is not None
+    
+    async def test_flush_writes_and_empties_buffer(self, manager):
+        """Test a flush sends every buffered section in one UPDATE."""
+        conn = AsyncMock()
+        manager.queue_section_status(1, 'processing')
+        manager.queue_section_status(2, 'failed', error_message="boom")
+        
+        assert await manager.flush_section_statuses(conn) == 2
+        
+        conn.execute.assert_awaited_once()
+        ids, statuses = conn.execute.call_args[0][1:3]
+        assert ids == [1, 2]
+        assert statuses == ['processing', 'failed']
+        assert manager._pending_updates == {}
+        assert await manager.flush_section_statuses(conn) == 0
+    
+    async def test_failed_flush_keeps_buffer(self, manager):
+        """Test updates survive a failed flush and are written by the next one."""
+        conn = AsyncMock()
+        conn.execute.side_effect = [RuntimeError("connection lost"), None]
+        manager.queue_section_status(1, 'processing')
+        manager.queue_section_status(2, 'completed', chunks_created=4)
+        
+        with pytest.raises(RuntimeError):
+            await manager.flush_section_statuses(conn)
+        
+        assert set(manager._pending_updates) == {1, 2}
+        assert await manager.flush_section_statuses(conn) == 2
+        assert manager._pending_updates == {}
+    
+    async def test_failed_flush_keeps_newer_transitions(self, manager):
+        """Test transitions queued while a flush was failing win over the restored ones."""
+        conn = AsyncMock()
+        manager.queue_section_status(1, 'processing')
+        
+        async def fail_after_new_transition(*args):
+            manager.queue_section_status(1, 'completed', chunks_created=2)
+            raise RuntimeError("connection lost")
+        
+        conn.execute.side_effect = fail_after_new_transition
+        
+        with pytest.raises(RuntimeError):
+            await manager.flush_section_statuses(conn)
+        
+        update = manager._pending_updates[1]
+        assert update['status'] == 'completed'
+        assert update['chunks_created'] == 2
+        assert update['started_at'] is not None
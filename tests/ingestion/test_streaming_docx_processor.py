@@ -0,0 +1,214 @@
+"""
+Tests for the streaming DOCX processor.
+"""
+
+import re
+import random
+import zipfile
+from pathlib import Path
+
+import pytest
+import docx
+from docx.enum.text import WD_BREAK
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from ingestion.streaming_docx_processor import StreamingDOCXProcessor, DocumentSection, W_P, W_TBL
+
+SAMPLE_DOCX = next(Path(__file__).parents[2].joinpath("documents_test").glob("*.docx"), None)
+
+
+def reference_compress(content: str) -> str:
+    """The original regex-per-pass _compress_content, kept as the reference output."""
+    content = re.sub(r'\s+', ' ', content)
+    content = re.sub(r'[.]{3,}', '...', content)
+    content = re.sub(r'[-]{3,}', '---', content)
+    content = re.sub(r'\(\s*\)', '', content)
+    content = re.sub(r'\[\s*\]', '', content)
+    for pattern, replacement in {
+        r'\b(Art|Artic|Articol)\b': 'Articolazione',
+        r'\b(Musc|Muscol)\b': 'Muscolo',
+        r'\b(Lig|Ligam)\b': 'Legamento',
+        r'\b(Tend|Tendin)\b': 'Tendine'
+    }.items():
+        content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+    return content.strip()
+
+
+def add_hyperlink(paragraph, text: str, url: str):
+    """Append a w:hyperlink run to `paragraph` (python-docx has no public API for it)."""
+    r_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = OxmlElement("w:r")
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+@pytest.fixture
+def sample_docx(tmp_path):
+    """DOCX with tabs, line/page breaks, a hyperlink and a table."""
+    document = docx.Document()
+    document.add_heading("Lesione del legamento crociato", level=1)
+    document.add_paragraph("Test\tdi Lachman\tpositivo.")
+
+    paragraph = document.add_paragraph("Prima riga")
+    paragraph.add_run().add_break()
+    paragraph.add_run("seconda riga")
+    paragraph.add_run().add_break(WD_BREAK.PAGE)
+    paragraph.add_run("dopo il salto pagina")
+
+    paragraph = document.add_paragraph("Linee guida: ")
+    add_hyperlink(paragraph, "vedi fonte", "https://example.org/linee-guida")
+    paragraph.add_run(" per i dettagli.")
+
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Test"
+    table.cell(0, 1).text = "Esito"
+    table.cell(1, 0).text = "Cassetto\tanteriore"
+    table.cell(1, 1).text = "Positivo"
+    table.cell(1, 1).add_paragraph("grado 2")
+
+    document.add_paragraph("")
+    document.add_paragraph("FINE")
+
+    path = tmp_path / "sample.docx"
+    document.save(path)
+    return path
+
+
+def body_elements(processor, path):
+    with zipfile.ZipFile(path) as docx_zip, docx_zip.open("word/document.xml") as document_xml:
+        return list(processor._iter_body_elements(document_xml))
+
+
+def expected_table_content(table) -> str:
+    """Table text as _extract_table_content builds it, from python-docx cell text."""
+    rows = []
+    for row in table.rows:
+        cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+        if cells:
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+class TestMatchesPythonDocx:
+    """Test the streaming parser reads the same text as python-docx."""
+    
+    def test_paragraph_text(self, sample_docx):
+        """Test paragraphs with tabs, breaks and hyperlinks match Paragraph.text."""
+        processor = StreamingDOCXProcessor()
+        elements = body_elements(processor, sample_docx)
+        document = docx.Document(sample_docx)
+        
+        texts = [processor._paragraph_text(element) for element in elements if element.tag == W_P]
+        
+        assert texts == [paragraph.text for paragraph in document.paragraphs]
+        assert "Test\tdi Lachman\tpositivo." in texts
+        assert "Prima riga\nseconda rigadopo il salto pagina" in texts
+        assert "Linee guida: vedi fonte per i dettagli." in texts
+    
+    def test_table_cells(self, sample_docx):
+        """Test table content is built from the same cell text as python-docx."""
+        processor = StreamingDOCXProcessor()
+        elements = body_elements(processor, sample_docx)
+        document = docx.Document(sample_docx)
+        
+        tables = [processor._extract_table_content(element) for element in elements if element.tag == W_TBL]
+        
+        assert tables == [expected_table_content(table) for table in document.tables]
+        assert tables == ["Test | Esito\nCassetto\tanteriore | Positivo\ngrado 2"]
+    
+    def test_sections(self, sample_docx):
+        """Test body order, heading detection and empty paragraph skipping."""
+        processor = StreamingDOCXProcessor(compression_enabled=False)
+        with zipfile.ZipFile(sample_docx) as docx_zip:
+            assert "Heading1" in processor._read_heading_styles(docx_zip)
+        
+        sections = list(processor.process_docx_streaming(str(sample_docx)))
+        
+        assert [section.section_type for section in sections] == ["heading", "paragraph", "paragraph", "paragraph", "table", "heading"]
+        assert sections[0].content == "Lesione del legamento crociato"
+        assert sections[-1].content == "FINE"
+    
+    @pytest.mark.skipif(SAMPLE_DOCX is None, reason="documents_test sample not available")
+    def test_sample_document(self):
+        """Test the bundled sample reads like python-docx and yields its known section count."""
+        processor = StreamingDOCXProcessor()
+        elements = body_elements(processor, SAMPLE_DOCX)
+        document = docx.Document(SAMPLE_DOCX)
+        
+        texts = [processor._paragraph_text(element) for element in elements if element.tag == W_P]
+        
+        assert texts == [paragraph.text for paragraph in document.paragraphs]
+        assert len(list(processor.process_docx_streaming(str(SAMPLE_DOCX)))) == 125
+
+
+class TestSplitLargeSection:
+    """Test splitting sections longer than max_section_size."""
+    
+    def test_part_position_is_first_sentence_offset(self):
+        """Test each part's position is where its first sentence starts in the section."""
+        processor = StreamingDOCXProcessor(max_section_size=120)
+        separators = [". ", "!  ", "?\n", "... ", ". "]
+        content = "".join(f"Frase {i} sul ginocchio e sul suo recupero funzionale{separators[i % len(separators)]}" for i in range(20)).strip()
+        section = DocumentSection(content=content, section_type="paragraph", position=1000, metadata={})
+        
+        parts = list(processor._split_large_section(section))
+        
+        assert len(parts) > 1
+        assert parts[0].position == section.position
+        for part in parts:
+            first_sentence = part.content.split(". ")[0]
+            offset = part.position - section.position
+            assert content[offset:].startswith(first_sentence)
+        positions = [part.position for part in parts]
+        assert positions == sorted(set(positions))
+    
+    def test_parts_keep_section_metadata(self):
+        """Test parts are numbered and fall back to the section metadata."""
+        processor = StreamingDOCXProcessor(max_section_size=40)
+        section = DocumentSection(content="Prima frase lunga abbastanza. Seconda frase lunga abbastanza.", section_type="paragraph", position=0, metadata={"file_name": "a.docx"})
+        
+        parts = list(processor._split_large_section(section))
+        
+        assert [part.metadata["split_part"] for part in parts] == [0, 1]
+        assert all(part.metadata["file_name"] == "a.docx" for part in parts)
+        assert all(part.section_type == "paragraph_split" for part in parts)
+
+
+class TestCompressContent:
+    """Test content compression keeps the original output."""
+    
+    @pytest.mark.parametrize("content,expected", [
+        ("  Lig  crociato\tanteriore\n", "Legamento crociato anteriore"),
+        ("Art. del ginocchio . . . .....", "Articolazione. del ginocchio . . . ..."),
+        ("MUSC quadricipite ( ) e tend [ \t]rotuleo", "Muscolo quadricipite  e Tendine rotuleo"),
+        ("Ligamento, Articolare, artic", "Ligamento, Articolare, Articolazione"),
+        ("-----\u00a0\u2003fine", "--- fine"),
+        ("", ""),
+    ])
+    def test_known_outputs(self, content, expected):
+        """Test representative inputs."""
+        assert StreamingDOCXProcessor()._compress_content(content) == expected
+    
+    def test_matches_reference_on_random_inputs(self):
+        """Test byte-identical output to the reference implementation on generated inputs."""
+        processor = StreamingDOCXProcessor()
+        tokens = ["Art", "artic", "ARTICOL", "Musc", "muscol", "Lig", "ligam", "Tend", "TENDIN", "Articolo",
+                  "testo", "ginocchio", "è", "(", ")", "[", "]", ".", "..", "-", "--", " ", "  ", "\t", "\n",
+                  "\r\n", "\u00a0", "\u2003", "\x0b", "_", "1", ",", "'"]
+        rng = random.Random(1234)
+        
+        for _ in range(2000):
+            content = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 30)))
+            assert processor._compress_content(content) == reference_compress(content), repr(content)
+    
+    def test_disabled_returns_input(self):
+        """Test content is untouched when compression is disabled."""
+        content = "  Lig ( )  "
+        assert StreamingDOCXProcessor(compression_enabled=False)._compress_content(content) == content